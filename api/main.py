@@ -1,10 +1,16 @@
 """FastAPI backend for SQL Copilot web interface."""
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import json
 import sys
+import time
+import anyio
 from pathlib import Path
 
 # Add project root to path
@@ -13,6 +19,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from config.settings import settings
 from database import DatabaseConnection, SchemaManager
 from core import NL2SQLConverter, QueryValidator, QueryExplainer, ErrorCorrector
+from core.llm_client import warm_up
 from utils.logger import get_logger
 
 logger = get_logger("api.main")
@@ -21,7 +28,8 @@ logger = get_logger("api.main")
 app = FastAPI(
     title="SQL Copilot API",
     description="Natural Language to SQL API with RAG",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -41,15 +49,34 @@ validator = None
 explainer = None
 error_corrector = None
 rag_retriever = None
+_keepalive_task = None
+
+# In-flight NL2SQL conversions keyed by request hash (single-flight)
+_inflight: Dict[bytes, asyncio.Future] = {}
+
+
+async def _keepalive_loop():
+    """Periodically ping Ollama so the model stays resident."""
+    while True:
+        await asyncio.sleep(settings.llm_keepalive_interval)
+        await asyncio.to_thread(warm_up, explainer.llm)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize components on startup."""
     global db, schema_manager, nl2sql, validator, explainer, error_corrector, rag_retriever
+    global _keepalive_task
     
     logger.info("Initializing SQL Copilot API...")
     
+    # Blocking work (Ollama, SQLite) runs in worker threads; size both the
+    # asyncio default executor and Starlette's anyio threadpool
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.api_thread_pool_size)
+    )
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.api_thread_pool_size
+    
     try:
         # Initialize database components
         db = DatabaseConnection(settings.database_path)
@@ -58,8 +85,8 @@ async def startup_event():
         # Initialize RAG if enabled
         if settings.rag_enabled:
             try:
-                from rag.retriever import SchemaRetriever
-                rag_retriever = SchemaRetriever()
+                from rag.retriever import get_retriever
+                rag_retriever = get_retriever()
                 if rag_retriever.is_indexed():
                     logger.info("RAG retriever initialized")
                 else:
@@ -75,6 +102,11 @@ async def startup_event():
         explainer = QueryExplainer()
         error_corrector = ErrorCorrector(schema_manager)
         
+        # Load the model before the first request instead of during it
+        if settings.llm_warmup_enabled:
+            await asyncio.to_thread(warm_up, explainer.llm)
+            _keepalive_task = asyncio.create_task(_keepalive_loop())
+        
         logger.info("SQL Copilot API initialized successfully")
     
     except Exception as e:
@@ -82,6 +114,13 @@ async def startup_event():
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks on shutdown."""
+    if _keepalive_task is not None:
+        _keepalive_task.cancel()
+
+
 # Request/Response Models
 class NL2SQLRequest(BaseModel):
     question: str
@@ -148,17 +187,59 @@ async def health_check():
 
 @app.post("/api/v1/query/nl2sql", response_model=NL2SQLResponse)
 async def convert_nl_to_sql(request: NL2SQLRequest):
-    """Convert natural language to SQL."""
+    """
+    Convert natural language to SQL.
+    
+    Concurrent identical requests are coalesced: the first one runs the
+    conversion and the others await its result.
+    """
+    logger.info(f"NL2SQL request: {request.question}")
+    
+    key = hashlib.blake2b(
+        f"{request.question}\x00{request.context or ''}".encode(), digest_size=16
+    ).digest()
+    
+    pending = _inflight.get(key)
+    if pending is not None:
+        logger.info("Joining in-flight NL2SQL conversion")
+        return await asyncio.shield(pending)
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
     try:
-        logger.info(f"NL2SQL request: {request.question}")
-        
-        # Convert to SQL
-        result = nl2sql.convert(request.question, request.context)
+        response = await _convert_nl_to_sql(request)
+        future.set_result(response)
+        return response
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark the exception as retrieved when nobody else is waiting
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+async def _convert_nl_to_sql(request: NL2SQLRequest) -> NL2SQLResponse:
+    """Run a single NL2SQL conversion (LLM, RAG tables)."""
+    # Retrieve the tables once, alongside the converter's cache lookup, and
+    # hand the task to the converter, which would otherwise run its own
+    # retrieval; they are reported as tables_used (if RAG was used)
+    retrieval = None
+    if rag_retriever and settings.rag_enabled:
+        retrieval = asyncio.ensure_future(rag_retriever.aretrieve(request.question))
+    
+    try:
+        result = await nl2sql.aconvert(request.question, request.context, tables=retrieval)
         
-        # Get tables used (if RAG was used)
         tables_used = None
-        if rag_retriever and settings.rag_enabled:
-            tables_used = rag_retriever.retrieve(request.question)
+        if retrieval is not None:
+            try:
+                tables_used = await retrieval
+            except Exception as e:
+                logger.warning(f"RAG retrieval failed: {e}")
         
         return NL2SQLResponse(
             sql=result['sql'],
@@ -170,6 +251,9 @@ async def convert_nl_to_sql(request: NL2SQLRequest):
     except Exception as e:
         logger.error(f"NL2SQL conversion failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if retrieval is not None and not retrieval.done():
+            retrieval.cancel()
 
 
 @app.post("/api/v1/query/execute", response_model=ExecuteQueryResponse)
@@ -178,17 +262,16 @@ async def execute_query(request: ExecuteQueryRequest):
     try:
         logger.info(f"Executing query: {request.sql[:100]}...")
         
-        # Validate first
-        is_valid, warnings = validator.validate(request.sql)
+        # Validate and execute
+        start = time.perf_counter()
+        is_valid, warnings, results = await asyncio.to_thread(
+            db.validate_and_execute, request.sql, validator
+        )
+        execution_time = time.perf_counter() - start
+        
         if not is_valid:
             raise HTTPException(status_code=400, detail=f"Invalid query: {warnings}")
         
-        # Execute
-        import time
-        start_time = time.time()
-        results = db.execute_query(request.sql)
-        execution_time = time.time() - start_time
-        
         return ExecuteQueryResponse(
             results=results,
             row_count=len(results),
@@ -202,11 +285,29 @@ async def execute_query(request: ExecuteQueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/v1/query/execute/stream")
+async def execute_query_stream(request: ExecuteQueryRequest):
+    """Execute SQL query and stream rows as newline-delimited JSON."""
+    is_valid, warnings = await asyncio.to_thread(validator.validate, request.sql)
+    if not is_valid:
+        raise HTTPException(status_code=400, detail=f"Invalid query: {warnings}")
+    
+    def row_stream():
+        try:
+            for rows in db.iter_query(request.sql):
+                yield "".join(json.dumps(row, default=str) + "\n" for row in rows)
+        except Exception as e:
+            logger.error(f"Streaming query failed: {e}")
+            yield json.dumps({"error": str(e)}) + "\n"
+    
+    return StreamingResponse(row_stream(), media_type="application/x-ndjson")
+
+
 @app.post("/api/v1/query/validate", response_model=ValidateQueryResponse)
 async def validate_query(request: ValidateQueryRequest):
     """Validate SQL query."""
     try:
-        is_valid, warnings = validator.validate(request.sql)
+        is_valid, warnings = await asyncio.to_thread(validator.validate, request.sql)
         
         return ValidateQueryResponse(
             is_valid=is_valid,
@@ -222,7 +323,7 @@ async def validate_query(request: ValidateQueryRequest):
 async def explain_query(request: ExplainQueryRequest):
     """Explain SQL query."""
     try:
-        result = explainer.explain(request.sql)
+        result = await asyncio.to_thread(explainer.explain, request.sql)
         
         return ExplainQueryResponse(
             explanation=result['explanation'],
@@ -234,30 +335,69 @@ async def explain_query(request: ExplainQueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/v1/query/explain/stream")
+async def explain_query_stream(request: ExplainQueryRequest):
+    """Stream a SQL query explanation as server-sent events."""
+    def event_stream():
+        try:
+            for chunk in explainer.explain_stream(request.sql):
+                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+            yield f"data: {json.dumps({'done': True})}\n\n"
+        except Exception as e:
+            logger.error(f"Streaming explanation failed: {e}")
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+    
+    # Sync generators are iterated in Starlette's threadpool, so blocking
+    # reads from Ollama do not stall the event loop
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.post("/api/v1/admin/cache/clear")
+async def clear_caches():
+    """Clear in-process LLM response and schema metadata caches."""
+    try:
+        explainer.cache_clear()
+        nl2sql.cache_clear()
+        schema_manager.clear_cache()
+        
+        return {"status": "cleared"}
+    
+    except Exception as e:
+        logger.error(f"Failed to clear caches: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _build_table_schema(table_name: str) -> Dict[str, Any]:
+    """Collect schema metadata and sample rows for one table (blocking)."""
+    table_info = schema_manager.get_table_info(table_name, include_samples=True)
+    
+    return {
+        "name": table_name,
+        "row_count": table_info.row_count,
+        "columns": [
+            {
+                "name": col.name,
+                "type": col.type,
+                "nullable": col.nullable,
+                "primary_key": col.primary_key,
+                "default_value": col.default_value
+            }
+            for col in table_info.columns
+        ],
+        "foreign_keys": schema_manager.get_foreign_keys(table_name),
+        "sample_data": table_info.sample_data[:5]  # First 5 rows
+    }
+
+
 @app.get("/api/v1/schema")
 async def get_schema():
     """Get database schema."""
     try:
-        tables = schema_manager.get_all_tables()
-        schema_info = {}
+        schema_info = await asyncio.to_thread(schema_manager.get_all_schema_bulk)
         
-        for table_name in tables:
-            table_info = schema_manager.get_table_info(table_name, include_samples=False)
-            schema_info[table_name] = {
-                "row_count": table_info.row_count,
-                "columns": [
-                    {
-                        "name": col.name,
-                        "type": col.type,
-                        "nullable": col.nullable,
-                        "primary_key": col.primary_key
-                    }
-                    for col in table_info.columns
-                ],
-                "foreign_keys": schema_manager.get_foreign_keys(table_name)
-            }
-        
-        return schema_info
+        # Return the response directly so orjson serializes the ColumnInfo
+        # dataclasses natively, skipping FastAPI's jsonable_encoder pass
+        return ORJSONResponse(schema_info)
     
     except Exception as e:
         logger.error(f"Failed to get schema: {e}")
@@ -268,24 +408,7 @@ async def get_schema():
 async def get_table_schema(table_name: str):
     """Get schema for specific table."""
     try:
-        table_info = schema_manager.get_table_info(table_name, include_samples=True)
-        
-        return {
-            "name": table_name,
-            "row_count": table_info.row_count,
-            "columns": [
-                {
-                    "name": col.name,
-                    "type": col.type,
-                    "nullable": col.nullable,
-                    "primary_key": col.primary_key,
-                    "default_value": col.default_value
-                }
-                for col in table_info.columns
-            ],
-            "foreign_keys": schema_manager.get_foreign_keys(table_name),
-            "sample_data": table_info.sample_data[:5]  # First 5 rows
-        }
+        return await asyncio.to_thread(_build_table_schema, table_name)
     
     except Exception as e:
         logger.error(f"Failed to get table schema: {e}")
@@ -293,55 +416,165 @@ async def get_table_schema(table_name: str):
 
 
 # WebSocket for real-time query execution
+_WS_INBOX_SIZE = 32
+_WS_MAX_CONCURRENT = 8
+
+
+async def _ws_reader(websocket: WebSocket, inbox: asyncio.Queue):
+    """Read client messages into the inbox; a None sentinel marks the end."""
+    try:
+        while True:
+            await inbox.put(await websocket.receive_json())
+    finally:
+        await inbox.put(None)
+
+
+async def _ws_stream_rows(sql: str, send) -> int:
+    """Send a query's rows as they are fetched; returns the row count."""
+    row_count = 0
+    batches = db.iter_query(sql)
+    fetch = None
+    try:
+        while True:
+            # Shielded so a cancelled handler leaves the worker thread to
+            # finish its batch before the generator is closed
+            fetch = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+            rows = await asyncio.shield(fetch)
+            if rows is None:
+                break
+            row_count += len(rows)
+            await send({"type": "rows", "rows": rows})
+    finally:
+        if fetch is not None and not fetch.done():
+            # Closing a generator another thread is running raises
+            # ValueError; close it once the pending batch has been fetched
+            def close_batches(done: asyncio.Future):
+                if not done.cancelled():
+                    done.exception()
+                batches.close()
+            fetch.add_done_callback(close_batches)
+        else:
+            batches.close()
+    
+    return row_count
+
+
+async def _ws_handle(websocket: WebSocket, data: Dict[str, Any], send_lock: asyncio.Lock):
+    """
+    Run one WebSocket action off the event loop and send its result.
+    
+    Every message sent for the action echoes the client-supplied "id", so
+    replies to concurrent actions can be matched to their requests.
+    """
+    action = data.get("action")
+    request_id = data.get("id")
+    
+    async def send(message: Dict[str, Any]):
+        if request_id is not None:
+            message["id"] = request_id
+        async with send_lock:
+            await websocket.send_json(message)
+    
+    try:
+        if action == "nl2sql":
+            # Convert NL to SQL
+            question = data.get("question")
+            result = await asyncio.to_thread(nl2sql.convert, question)
+            message = {
+                "type": "nl2sql_result",
+                "data": result
+            }
+        
+        elif action == "execute":
+            # Execute SQL
+            sql = data.get("sql")
+            is_valid, warnings = await asyncio.to_thread(validator.validate, sql)
+            
+            if not is_valid:
+                message = {
+                    "type": "error",
+                    "message": f"Invalid query: {warnings}"
+                }
+            elif data.get("stream"):
+                # Opt-in: rows are sent batch by batch, then a done message
+                row_count = await _ws_stream_rows(sql, send)
+                message = {"type": "done", "row_count": row_count}
+            else:
+                results = await asyncio.to_thread(db.execute_query, sql)
+                message = {
+                    "type": "execute_result",
+                    "data": {
+                        "results": results,
+                        "row_count": len(results)
+                    }
+                }
+        
+        else:
+            return
+    
+    except Exception as e:
+        logger.error(f"WebSocket action '{action}' failed: {e}")
+        message = {"type": "error", "message": str(e)}
+    
+    await send(message)
+
+
 @app.websocket("/ws/query")
 async def websocket_query(websocket: WebSocket):
-    """WebSocket endpoint for real-time query execution."""
+    """
+    WebSocket endpoint for real-time query execution.
+    
+    Messages are received by a dedicated reader task and each action runs in
+    its own task, so a slow conversion or query never delays pings or later
+    messages. At most _WS_MAX_CONCURRENT actions run at once per socket.
+    
+    Replies echo the request's "id" field. An execute action replies with a
+    single execute_result message, or, when it sets "stream": true, with
+    rows messages followed by a done message.
+    """
     await websocket.accept()
     logger.info("WebSocket connection established")
     
+    inbox: asyncio.Queue = asyncio.Queue(maxsize=_WS_INBOX_SIZE)
+    semaphore = asyncio.Semaphore(_WS_MAX_CONCURRENT)
+    send_lock = asyncio.Lock()
+    handlers = set()
+    reader = asyncio.create_task(_ws_reader(websocket, inbox))
+    
+    async def run_bounded(data: Dict[str, Any]):
+        async with semaphore:
+            await _ws_handle(websocket, data, send_lock)
+    
     try:
         while True:
-            # Receive message
-            data = await websocket.receive_json()
-            action = data.get("action")
+            data = await inbox.get()
+            if data is None:
+                break
             
-            if action == "nl2sql":
-                # Convert NL to SQL
-                question = data.get("question")
-                result = nl2sql.convert(question)
-                await websocket.send_json({
-                    "type": "nl2sql_result",
-                    "data": result
-                })
+            if data.get("action") == "ping":
+                pong = {"type": "pong"}
+                if data.get("id") is not None:
+                    pong["id"] = data["id"]
+                async with send_lock:
+                    await websocket.send_json(pong)
+                continue
             
-            elif action == "execute":
-                # Execute SQL
-                sql = data.get("sql")
-                is_valid, warnings = validator.validate(sql)
-                
-                if not is_valid:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": f"Invalid query: {warnings}"
-                    })
-                else:
-                    results = db.execute_query(sql)
-                    await websocket.send_json({
-                        "type": "execute_result",
-                        "data": {
-                            "results": results,
-                            "row_count": len(results)
-                        }
-                    })
-            
-            elif action == "ping":
-                await websocket.send_json({"type": "pong"})
+            task = asyncio.create_task(run_bounded(data))
+            handlers.add(task)
+            task.add_done_callback(handlers.discard)
+        
+        # Surface the reason the reader stopped (normally a disconnect)
+        await reader
     
     except WebSocketDisconnect:
         logger.info("WebSocket connection closed")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         await websocket.close()
+    finally:
+        reader.cancel()
+        for task in handlers:
+            task.cancel()
 
 
 if __name__ == "__main__":
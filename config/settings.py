@@ -13,6 +13,12 @@ class Settings(BaseSettings):
     
     # Database Configuration
     database_path: str = Field(default="data/ecommerce.db", env="DATABASE_PATH")
+    db_pool_size: int = Field(default=8, env="DB_POOL_SIZE")
+    # Seconds to wait for a free pooled connection before giving up
+    db_pool_timeout: float = Field(default=30.0, env="DB_POOL_TIMEOUT")
+    # Switch the database to WAL journaling so readers never block each
+    # other; this is persistent and changes the database file itself
+    db_wal_mode: bool = Field(default=False, env="DB_WAL_MODE")
     
     # Logging Configuration
     log_level: str = Field(default="DEBUG", env="LOG_LEVEL")
@@ -20,11 +26,12 @@ class Settings(BaseSettings):
     
     # RAG Configuration
     vector_db_path: str = Field(default="data/chroma_db", env="VECTOR_DB_PATH")
-    embedding_model: str = Field(default="models/embedding-001", env="EMBEDDING_MODEL")
     
     # Query Configuration
     max_query_timeout: int = Field(default=30, env="MAX_QUERY_TIMEOUT")
     max_result_rows: int = Field(default=1000, env="MAX_RESULT_ROWS")
+    # Rows shown in the CLI results table; the rest are only counted
+    max_display_rows: int = Field(default=100, env="MAX_DISPLAY_ROWS")
     enable_dangerous_queries: bool = Field(default=False, env="ENABLE_DANGEROUS_QUERIES")
     
     # LLM Configuration
@@ -33,12 +40,56 @@ class Settings(BaseSettings):
     ollama_base_url: str = Field(default="http://localhost:11434", env="OLLAMA_BASE_URL")
     llm_temperature: float = Field(default=0.1, env="LLM_TEMPERATURE")
     llm_max_tokens: int = Field(default=2048, env="LLM_MAX_TOKENS")
+    ollama_keep_alive: str = Field(default="1h", env="OLLAMA_KEEP_ALIVE")
+    llm_warmup_enabled: bool = Field(default=True, env="LLM_WARMUP_ENABLED")
+    llm_keepalive_interval: int = Field(default=1800, env="LLM_KEEPALIVE_INTERVAL")
+    # Concurrent generations per batch; match the server's OLLAMA_NUM_PARALLEL
+    llm_max_parallel: int = Field(default=4, env="LLM_MAX_PARALLEL")
+    
+    # API Configuration
+    api_thread_pool_size: int = Field(default=64, env="API_THREAD_POOL_SIZE")
+    
+    # Cache Configuration
+    explain_cache_size: int = Field(default=512, env="EXPLAIN_CACHE_SIZE")
+    semantic_cache_enabled: bool = Field(default=True, env="SEMANTIC_CACHE_ENABLED")
+    semantic_cache_threshold: float = Field(default=0.95, env="SEMANTIC_CACHE_THRESHOLD")
+    semantic_cache_size: int = Field(default=1024, env="SEMANTIC_CACHE_SIZE")
+    semantic_cache_ttl: int = Field(default=24 * 3600, env="SEMANTIC_CACHE_TTL")
+    llm_cache_enabled: bool = Field(default=True, env="LLM_CACHE_ENABLED")
+    llm_cache_path: str = Field(default="data/llm_cache.db", env="LLM_CACHE_PATH")
+    llm_cache_ttl: int = Field(default=7 * 24 * 3600, env="LLM_CACHE_TTL")
+    retrieval_cache_enabled: bool = Field(default=True, env="RETRIEVAL_CACHE_ENABLED")
+    retrieval_cache_path: str = Field(default="data/retrieval_cache.db", env="RETRIEVAL_CACHE_PATH")
+    embedding_cache_enabled: bool = Field(default=True, env="EMBEDDING_CACHE_ENABLED")
+    embedding_cache_path: str = Field(default="data/embedding_cache.db", env="EMBEDDING_CACHE_PATH")
+    embedding_cache_ttl: int = Field(default=30 * 24 * 3600, env="EMBEDDING_CACHE_TTL")
     
     # RAG Configuration
     rag_enabled: bool = Field(default=True, env="RAG_ENABLED")
     rag_top_k_tables: int = Field(default=5, env="RAG_TOP_K")
+    # Vector store backend for schema embeddings: "chroma", "faiss" or "hnswlib"
+    vector_store: str = Field(default="chroma", env="VECTOR_STORE")
+    # Texts per Ollama /api/embed request
+    embed_batch_size: int = Field(default=32, env="EMBED_BATCH_SIZE")
+    # Include sample rows in the table descriptions that are embedded
+    index_include_samples: bool = Field(default=False, env="INDEX_INCLUDE_SAMPLES")
+    # Batch requests in flight at once while indexing the schema
+    embed_concurrency: int = Field(default=4, env="EMBED_CONCURRENCY")
+    # Seconds before an embedding request to Ollama is abandoned
+    embed_timeout: float = Field(default=30.0, env="EMBED_TIMEOUT")
+    # Approximate token budget for the schema section of the NL2SQL prompt
+    schema_context_max_tokens: int = Field(default=2048, env="SCHEMA_CONTEXT_MAX_TOKENS")
+    # Seconds before cached sample rows (and row counts) are re-read
+    schema_sample_ttl: int = Field(default=300, env="SCHEMA_SAMPLE_TTL")
+    # Seconds between checks of the database for schema changes
+    schema_version_check_interval: float = Field(default=1.0, env="SCHEMA_VERSION_CHECK_INTERVAL")
     rag_similarity_threshold: float = Field(default=0.3, env="RAG_SIMILARITY_THRESHOLD")
     embedding_model: str = Field(default="nomic-embed-text", env="EMBEDDING_MODEL")
+    # Embedding server: "ollama", or "tei" for Hugging Face Text Embeddings Inference
+    embedding_backend: str = Field(default="ollama", env="EMBEDDING_BACKEND")
+    # Cached embeddings are keyed by this URL; use a new URL (or clear
+    # data/*_cache.db) when the TEI server switches models
+    tei_base_url: str = Field(default="http://localhost:8080", env="TEI_BASE_URL")
     
     class Config:
         env_file = ".env"
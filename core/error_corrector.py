@@ -1,16 +1,53 @@
 """Error corrector for SQL queries using Ollama."""
 from typing import Dict, Any
-from langchain_community.llms import Ollama
-from config.settings import settings
+import re
+from core.llm_client import get_llm
 from utils.logger import get_logger
 from database.schema_manager import SchemaManager
 
 logger = get_logger("core.error_corrector")
 
+# Captures the fenced SQL block and the optional EXPLANATION section in one pass
+_CORRECTION_RE = re.compile(
+    r"```sql\s*(?P<sql>.*?)```.*?(?:EXPLANATION:\s*(?P<expl>.*))?$",
+    re.DOTALL | re.IGNORECASE
+)
+
 
 class ErrorCorrector:
     """Automatically corrects common SQL errors using local LLM."""
     
+    # Prompt pieces are immutable constants; only the schema, query and
+    # error are spliced in per call, most stable first.
+    _CORRECTION_PREFIX = """You are an expert SQL debugger. A SQL query has failed with an error. Your job is to fix it.
+
+Analyze the error and provide a corrected version of the query.
+
+RESPONSE FORMAT:
+CORRECTED SQL:
+```sql
+[Your corrected SQL query here]
+```
+
+EXPLANATION:
+[Explain what was wrong and how you fixed it]
+
+DATABASE SCHEMA:
+"""
+    _CORRECTION_QUERY = """
+
+FAILED QUERY:
+```sql
+"""
+    _CORRECTION_ERROR = """
+```
+
+ERROR MESSAGE:
+"""
+    _CORRECTION_SUFFIX = """
+
+Now provide the correction:"""
+    
     def __init__(self, schema_manager: SchemaManager):
         self.schema_manager = schema_manager
         self.llm = None
@@ -20,11 +57,7 @@ class ErrorCorrector:
     def _initialize_ollama(self):
         """Initialize Ollama LLM."""
         try:
-            self.llm = Ollama(
-                model=settings.llm_model,
-                base_url=settings.ollama_base_url,
-                temperature=0.2,
-            )
+            self.llm = get_llm(0.2)
             logger.info("Ollama initialized for error correction")
         
         except Exception as e:
@@ -70,74 +103,39 @@ class ErrorCorrector:
             raise
     
     def _get_schema_summary(self) -> str:
-        """Get a summary of the database schema."""
-        tables = self.schema_manager.get_all_tables()
-        summary_parts = ["Available tables and columns:\n"]
-        
-        for table_name in tables:
-            table_info = self.schema_manager.get_table_info(table_name, include_samples=False)
-            columns = [col.name for col in table_info.columns]
-            summary_parts.append(f"- {table_name}: {', '.join(columns)}")
-        
-        return "\n".join(summary_parts)
+        """Get a summary of the database schema (cached per schema version)."""
+        return self.schema_manager.get_compact_schema_summary()
     
     def _build_correction_prompt(self, sql_query: str, error: str, schema: str) -> str:
-        """Build prompt for error correction."""
+        """
+        Build prompt for error correction.
         
-        prompt = f"""You are an expert SQL debugger. A SQL query has failed with an error. Your job is to fix it.
-
-DATABASE SCHEMA:
-{schema}
-
-FAILED QUERY:
-```sql
-{sql_query}
-```
-
-ERROR MESSAGE:
-{error}
-
-Analyze the error and provide a corrected version of the query.
-
-RESPONSE FORMAT:
-CORRECTED SQL:
-```sql
-[Your corrected SQL query here]
-```
-
-EXPLANATION:
-[Explain what was wrong and how you fixed it]
-
-Now provide the correction:"""
-
-        return prompt
+        Ordered from most to least stable (instructions, schema, then the
+        failed query and error) so Ollama can reuse the cached prefix.
+        """
+        return "".join((
+            self._CORRECTION_PREFIX, schema,
+            self._CORRECTION_QUERY, sql_query,
+            self._CORRECTION_ERROR, error,
+            self._CORRECTION_SUFFIX,
+        ))
     
     def _parse_correction_response(self, response_text: str) -> Dict[str, Any]:
         """Parse the correction response."""
         
-        result = {
-            "sql": "",
-            "explanation": "",
-            "success": False
-        }
-        
-        try:
-            # Extract corrected SQL
-            if "```sql" in response_text:
-                sql_start = response_text.find("```sql") + 6
-                sql_end = response_text.find("```", sql_start)
-                result["sql"] = response_text[sql_start:sql_end].strip()
-                result["success"] = True
-            
-            # Extract explanation
-            if "EXPLANATION:" in response_text:
-                expl_start = response_text.find("EXPLANATION:") + 12
-                result["explanation"] = response_text[expl_start:].strip()
-            elif result["sql"]:
-                # If we found SQL but no explicit explanation, use the rest
-                result["explanation"] = "Query has been corrected based on the error message."
+        match = _CORRECTION_RE.search(response_text)
+        if not match:
+            logger.warning("No SQL block found in correction response")
+            return {
+                "sql": "",
+                "explanation": "",
+                "success": False
+            }
         
-        except Exception as e:
-            logger.error(f"Error parsing correction response: {e}")
+        explanation = match.group("expl") or "Query has been corrected based on the error message."
         
-        return result
+        return {
+            "sql": match.group("sql").strip(),
+            "explanation": explanation.strip(),
+            "success": True
+        }
@@ -1,28 +1,89 @@
 """Query explainer that converts SQL to natural language using Ollama."""
-from typing import Dict, Any
-from langchain_community.llms import Ollama
+from typing import Dict, Any, Iterator
+from functools import lru_cache
+import sqlparse
+from sqlparse import tokens as T
 from config.settings import settings
+from core.llm_client import get_llm
 from utils.logger import get_logger
 
 logger = get_logger("core.explainer")
 
 
+def _normalize_sql(sql: str) -> str:
+    """
+    Canonicalize SQL so equivalent queries share one cache entry.
+    
+    Comments are dropped, whitespace runs collapse to one space, keywords
+    are uppercased and unquoted identifiers lowercased; string literals and
+    quoted identifiers are kept exactly as written.
+    """
+    parts = []
+    pending_space = False
+    for ttype, value in sqlparse.lexer.tokenize(sql):
+        if ttype in T.Whitespace or ttype in T.Comment:
+            pending_space = True
+            continue
+        if pending_space and parts:
+            parts.append(" ")
+        pending_space = False
+        if ttype in T.Keyword:
+            value = value.upper()
+        elif ttype in T.Name:
+            value = value.lower()
+        parts.append(value)
+    return "".join(parts)
+
+
+class _ExplainKey(str):
+    """Normalized SQL used as the cache key, carrying the SQL as written."""
+    
+    def __new__(cls, sql: str):
+        key = super().__new__(cls, _normalize_sql(sql))
+        key.sql = sql
+        return key
+
+
 class QueryExplainer:
     """Explains SQL queries in natural language using local LLM."""
     
+    # Static instructions come first so every prompt shares a byte-identical
+    # prefix that Ollama can reuse from its KV cache; the query goes last.
+    _EXPLAIN_PREFIX = """You are an expert SQL teacher. Explain the SQL query given below in simple, clear language.
+
+Provide a step-by-step explanation that includes:
+1. What data is being retrieved
+2. From which tables
+3. What conditions/filters are applied
+4. How tables are joined (if applicable)
+5. Any aggregations or grouping
+6. How results are sorted/limited
+
+Make it easy to understand for someone learning SQL.
+
+SQL QUERY:
+```sql
+"""
+    _EXPLAIN_SUFFIX = """
+```
+
+EXPLANATION:"""
+    
     def __init__(self):
         self.llm = None
         self._initialize_ollama()
+        
+        # Per-instance LRU cache of explanations keyed by normalized SQL;
+        # the prompt still shows the query as the user wrote it
+        self._explain_cached = lru_cache(maxsize=settings.explain_cache_size)(
+            self._generate_explanation
+        )
         logger.info("Query Explainer initialized with Ollama")
     
     def _initialize_ollama(self):
         """Initialize Ollama LLM."""
         try:
-            self.llm = Ollama(
-                model=settings.llm_model,
-                base_url=settings.ollama_base_url,
-                temperature=0.3,
-            )
+            self.llm = get_llm(0.3)
             logger.info(f"Ollama initialized for explainer")
         
         except Exception as e:
@@ -43,15 +104,10 @@ class QueryExplainer:
         logger.debug(f"Query: {sql_query[:200]}...")
         
         try:
-            prompt = self._build_explanation_prompt(sql_query)
-            
-            logger.info("Calling Ollama for explanation...")
-            response = self.llm.invoke(prompt)
-            
-            logger.info("Explanation generated successfully")
+            explanation = self._explain_cached(_ExplainKey(sql_query))
             
             return {
-                "explanation": response.strip(),
+                "explanation": explanation,
                 "query": sql_query
             }
         
@@ -59,26 +115,42 @@ class QueryExplainer:
             logger.error(f"Failed to explain query: {e}")
             raise
     
+    def explain_stream(self, sql_query: str) -> Iterator[str]:
+        """
+        Stream an explanation of a SQL query as it is generated.
+        
+        Args:
+            sql_query: SQL query to explain
+        
+        Yields:
+            Explanation text chunks in generation order
+        """
+        logger.info("Streaming SQL query explanation")
+        
+        prompt = self._build_explanation_prompt(sql_query)
+        
+        logger.info("Streaming explanation from Ollama...")
+        yield from self.llm.stream(prompt)
+    
+    def _generate_explanation(self, key: _ExplainKey) -> str:
+        """Generate an explanation via Ollama (wrapped by the LRU cache)."""
+        prompt = self._build_explanation_prompt(key.sql)
+        
+        logger.info("Calling Ollama for explanation...")
+        response = self.llm.invoke(prompt)
+        
+        logger.info("Explanation generated successfully")
+        return response.strip()
+    
+    def cache_info(self):
+        """Return hit/miss statistics for the explanation cache."""
+        return self._explain_cached.cache_info()
+    
+    def cache_clear(self):
+        """Drop all cached explanations."""
+        self._explain_cached.cache_clear()
+        logger.info("Explanation cache cleared")
+    
     def _build_explanation_prompt(self, sql_query: str) -> str:
         """Build prompt for query explanation."""
-        
-        prompt = f"""You are an expert SQL teacher. Explain the following SQL query in simple, clear language.
-
-SQL QUERY:
-```sql
-{sql_query}
-```
-
-Provide a step-by-step explanation that includes:
-1. What data is being retrieved
-2. From which tables
-3. What conditions/filters are applied
-4. How tables are joined (if applicable)
-5. Any aggregations or grouping
-6. How results are sorted/limited
-
-Make it easy to understand for someone learning SQL.
-
-EXPLANATION:"""
-
-        return prompt
+        return "".join((self._EXPLAIN_PREFIX, sql_query, self._EXPLAIN_SUFFIX))
@@ -0,0 +1,83 @@
+"""Persistent exact-match cache for LLM responses backed by SQLite."""
+from typing import Optional, Dict, Any
+from pathlib import Path
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from config.settings import settings
+from utils.logger import get_logger
+
+logger = get_logger("core.llm_cache")
+
+
+class LLMCache:
+    """Stores parsed LLM responses keyed by a hash of everything that shaped them."""
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[int] = None):
+        self.path = path or settings.llm_cache_path
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.llm_cache_ttl
+        self._lock = threading.Lock()
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                input_hash TEXT PRIMARY KEY,
+                prompt_version TEXT,
+                model TEXT,
+                response TEXT,
+                created_at INTEGER,
+                expires_at INTEGER
+            )
+        """)
+        self._conn.commit()
+        logger.info(f"LLM cache opened at: {self.path}")
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Hash the inputs that determine an LLM response into a cache key."""
+        raw = "|".join(str(part) for part in parts)
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, input_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response for a key, or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM llm_cache WHERE input_hash = ?",
+                (input_hash,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        response, expires_at = row
+        if expires_at and expires_at < time.time():
+            logger.debug(f"LLM cache entry expired: {input_hash}")
+            return None
+
+        logger.debug(f"LLM cache hit: {input_hash}")
+        return json.loads(response)
+
+    def set(self, input_hash: str, response: Dict[str, Any], model: str, prompt_version: str):
+        """Store a response under a key with the configured TTL."""
+        now = int(time.time())
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(input_hash, prompt_version, model, response, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (input_hash, prompt_version, model, json.dumps(response), now, expires_at)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Delete all cached responses."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+        logger.info("LLM cache cleared")
@@ -0,0 +1,69 @@
+"""Shared Ollama LLM clients for all core components."""
+from typing import Dict
+import threading
+from langchain_community.llms import Ollama
+from ollama import AsyncClient
+from config.settings import settings
+from utils.logger import get_logger
+
+logger = get_logger("core.llm_client")
+
+_clients: Dict[float, Ollama] = {}
+_lock = threading.Lock()
+
+
+def get_llm(temperature: float) -> Ollama:
+    """
+    Get the shared Ollama client for a sampling temperature.
+
+    Components that use the same temperature share a single client instead
+    of each constructing their own.
+
+    Args:
+        temperature: Sampling temperature for generation
+
+    Returns:
+        Memoized LangChain Ollama instance
+    """
+    llm = _clients.get(temperature)
+    if llm is not None:
+        return llm
+
+    with _lock:
+        llm = _clients.get(temperature)
+        if llm is None:
+            llm = Ollama(
+                model=settings.llm_model,
+                base_url=settings.ollama_base_url,
+                temperature=temperature,
+                keep_alive=settings.ollama_keep_alive,
+            )
+            _clients[temperature] = llm
+            logger.info(f"Ollama client created (model={settings.llm_model}, temperature={temperature})")
+
+    return llm
+
+
+def get_async_client() -> AsyncClient:
+    """
+    Create an async Ollama client for the configured server.
+    
+    The underlying HTTP connection pool is bound to the event loop that first
+    uses it, so callers create one per loop (e.g. per batch) instead of
+    sharing a module-level instance.
+    """
+    return AsyncClient(host=settings.ollama_base_url)
+
+
+def warm_up(llm: Ollama):
+    """
+    Force Ollama to load the model by generating a single token.
+
+    Failures are logged rather than raised so an unavailable server does
+    not prevent startup.
+    """
+    try:
+        llm.invoke("ping", num_predict=1)
+        logger.info(f"Ollama model warmed up: {settings.llm_model}")
+    except Exception as e:
+        logger.warning(f"Ollama warm-up failed: {e}")
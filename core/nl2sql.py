@@ -1,22 +1,172 @@
 """Natural Language to SQL converter using Ollama (local LLM)."""
-from typing import Optional, Dict, Any
-from langchain_community.llms import Ollama
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Set, Tuple, Callable, Union, Awaitable
+import asyncio
+import re
+import threading
+from ollama import AsyncClient
 from config.settings import settings
+from core.llm_client import get_llm, get_async_client
+from core.llm_cache import LLMCache
+from core.semantic_cache import SemanticCache
 from utils.logger import get_logger
 from database.schema_manager import SchemaManager
+from rag.embeddings import embed_texts
 
 logger = get_logger("core.nl2sql")
 
+# Bump whenever _build_prompt or _get_schema_context change output so stale
+# cached responses are no longer matched
+PROMPT_VERSION = "5"
+
+# Well-formed response: fenced SQL, explanation and optional confidence
+_RESPONSE_RE = re.compile(
+    r"```sql\s*(?P<sql>.*?)```.*?EXPLANATION:\s*(?P<expl>.*?)(?:CONFIDENCE:\s*(?P<conf>.*))?$",
+    re.DOTALL | re.IGNORECASE
+)
+
+# First SELECT statement up to a semicolon, blank line or end of text
+_FALLBACK_SELECT_RE = re.compile(r"\bSELECT\b.*?(?:;|\n\s*\n|\Z)", re.IGNORECASE | re.DOTALL)
+
+_SQL_FENCE = "```sql"
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Numbers and quoted strings; paraphrases only share a cached result when
+# these match exactly, e.g. "top 5 customers" never reuses "top 10 customers"
+_LITERAL_RE = re.compile(r"'[^']*'|\"[^\"]*\"|\d+(?:\.\d+)?")
+
+# Question words mapped to column-name words they usually refer to
+_COLUMN_SYNONYMS = {
+    "cost": ("price", "amount", "total"),
+    "price": ("amount", "cost"),
+    "revenue": ("total", "amount", "price"),
+    "sales": ("total", "amount", "quantity"),
+    "spent": ("total", "amount"),
+    "when": ("date", "created", "time"),
+    "recent": ("date", "created"),
+    "latest": ("date", "created"),
+    "many": ("quantity", "count"),
+    "called": ("name",),
+    "contact": ("email", "phone"),
+    "where": ("city", "country", "address", "state"),
+}
+
+# Rough characters-per-token ratio used to apply the schema token budget
+_CHARS_PER_TOKEN = 4
+
+
+class _SQLFenceWatcher:
+    """Detects the fenced SQL block in a streamed response as soon as it closes."""
+    
+    def __init__(self, on_sql: Callable[[str], None]):
+        self.on_sql = on_sql
+        self.done = False
+        self._text = ""
+        self._sql_start = -1
+    
+    def feed(self, chunk: str):
+        """Append a streamed chunk and fire on_sql once the SQL fence is complete."""
+        if self.done:
+            return
+        
+        scan_from = max(0, len(self._text) - len(_SQL_FENCE))
+        self._text += chunk
+        
+        if self._sql_start < 0:
+            fence = self._text[scan_from:].lower().find(_SQL_FENCE)
+            if fence < 0:
+                return
+            self._sql_start = scan_from + fence + len(_SQL_FENCE)
+            scan_from = self._sql_start
+        
+        end = self._text.find("```", max(scan_from, self._sql_start))
+        if end < 0:
+            return
+        
+        self.done = True
+        sql = self._text[self._sql_start:end].strip()
+        logger.debug("SQL block complete, emitting before response finishes")
+        try:
+            self.on_sql(sql)
+        except Exception as e:
+            logger.error(f"on_sql callback failed: {e}")
+
 
 class NL2SQLConverter:
     """Converts natural language queries to SQL using local LLM via Ollama."""
     
+    # Maximum number of memoized per-table schema context fragments
+    _FRAGMENT_CACHE_SIZE = 512
+    # Non-key columns kept per table in the schema context
+    _TOP_COLUMNS = 8
+    # Tables above either limit are described without sample rows
+    _SAMPLE_MAX_ROWS = 100_000
+    _SAMPLE_MAX_COLUMNS = 20
+    
+    # Prompt pieces are immutable constants; only the schema summary, the
+    # retrieved tables, optional context and the question are spliced in
+    _PROMPT_HEAD = """You are an expert SQL query generator. Convert the natural language question into a valid SQLite query.
+
+IMPORTANT RULES:
+1. Generate ONLY valid SQLite syntax
+2. Use proper table and column names from the schema
+3. Include appropriate JOINs when querying multiple tables
+4. Use aliases for better readability
+5. Add LIMIT clause for queries that might return many rows
+6. Return results in a logical order (use ORDER BY)
+7. Use aggregate functions (COUNT, SUM, AVG, etc.) when appropriate
+
+RESPONSE FORMAT:
+Provide your response in the following format:
+
+SQL:
+```sql
+[Your SQL query here]
+```
+
+EXPLANATION:
+[Brief explanation of what the query does and why you structured it this way]
+
+CONFIDENCE:
+[High/Medium/Low - your confidence in this query]
+
+DATABASE SCHEMA:
+"""
+    _PROMPT_TABLES = """
+
+RELEVANT TABLES:
+"""
+    _PROMPT_CONTEXT = """
+ADDITIONAL CONTEXT:
+"""
+    _PROMPT_QUESTION = """
+USER QUESTION:
+"""
+    _PROMPT_TAIL = """
+
+Now generate the SQL query:"""
+    
     def __init__(self, schema_manager: SchemaManager, rag_retriever=None):
         self.schema_manager = schema_manager
         self.rag_retriever = rag_retriever
         self.llm = None
         self._initialize_ollama()
         
+        # (table name, kept columns) -> (table line, sample lines), valid for
+        # schema version _fragment_version
+        self._fragment_cache: "OrderedDict[Tuple[str, Tuple[str, ...]], Tuple[str, List[str]]]" = OrderedDict()
+        self._fragment_version = -1
+        self._fragment_lock = threading.Lock()
+        
+        self.cache = LLMCache() if settings.llm_cache_enabled else None
+        self.semantic_cache = None
+        if settings.semantic_cache_enabled:
+            self.semantic_cache = SemanticCache(
+                max_entries=settings.semantic_cache_size,
+                ttl_seconds=settings.semantic_cache_ttl
+            )
+        
         if rag_retriever:
             logger.info("NL2SQL Converter initialized with RAG retriever")
         else:
@@ -25,11 +175,7 @@ class NL2SQLConverter:
     def _initialize_ollama(self):
         """Initialize Ollama LLM."""
         try:
-            self.llm = Ollama(
-                model=settings.llm_model,
-                base_url=settings.ollama_base_url,
-                temperature=settings.llm_temperature,
-            )
+            self.llm = get_llm(settings.llm_temperature)
             logger.info(f"Ollama initialized with model: {settings.llm_model}")
             logger.info(f"Ollama URL: {settings.ollama_base_url}")
         
@@ -39,13 +185,21 @@ class NL2SQLConverter:
             logger.error(f"And the model is installed: ollama pull {settings.llm_model}")
             raise
     
-    def convert(self, natural_language_query: str, context: Optional[str] = None) -> Dict[str, Any]:
+    def convert(
+        self,
+        natural_language_query: str,
+        context: Optional[str] = None,
+        on_sql: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
         """
         Convert natural language to SQL query.
         
         Args:
             natural_language_query: User's question in natural language
             context: Optional additional context
+            on_sql: Optional callback receiving the SQL as soon as its fenced
+                block has been generated, before the explanation and
+                confidence are decoded; callers can start validation early
         
         Returns:
             Dictionary with 'sql', 'explanation', and 'confidence'
@@ -53,17 +207,25 @@ class NL2SQLConverter:
         logger.info(f"Converting NL query: {natural_language_query}")
         
         try:
-            # Get schema context
-            schema_context = self._get_schema_context(natural_language_query)
-            logger.debug(f"Schema context retrieved: {len(schema_context)} characters")
+            cached, slot = self._cache_lookup(natural_language_query, context)
+            if cached is not None:
+                if on_sql is not None:
+                    on_sql(cached["sql"])
+                return cached
             
-            # Build prompt
-            prompt = self._build_prompt(natural_language_query, schema_context, context)
-            logger.debug("Prompt built successfully")
+            prompt = self._prepare_prompt(natural_language_query, context)
             
             # Generate SQL using Ollama
             logger.info("Calling Ollama API...")
-            response = self.llm.invoke(prompt)
+            if on_sql is None:
+                response = self.llm.invoke(prompt)
+            else:
+                watcher = _SQLFenceWatcher(on_sql)
+                chunks = []
+                for chunk in self.llm.stream(prompt):
+                    chunks.append(chunk)
+                    watcher.feed(chunk)
+                response = "".join(chunks)
             
             logger.info("Ollama API response received")
             logger.debug(f"Response text length: {len(response)} characters")
@@ -72,113 +234,399 @@ class NL2SQLConverter:
             result = self._parse_response(response)
             logger.info(f"SQL generated successfully: {result['sql'][:100]}...")
             
+            self._cache_store(slot, result)
             return result
         
         except Exception as e:
             logger.error(f"Failed to convert NL to SQL: {e}")
             raise
     
-    def _get_schema_context(self, query: str) -> str:
+    async def aconvert(
+        self,
+        natural_language_query: str,
+        context: Optional[str] = None,
+        client: Optional[AsyncClient] = None,
+        on_sql: Optional[Callable[[str], None]] = None,
+        tables: Optional[Union[List[str], Awaitable[List[str]]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Convert natural language to SQL without blocking the event loop.
+        
+        Cache lookups and schema retrieval run in worker threads; generation
+        is awaited on Ollama's async client. RAG retrieval starts alongside
+        the cache lookup instead of after it.
+        
+        Args:
+            natural_language_query: User's question in natural language
+            context: Optional additional context
+            client: Async Ollama client to reuse; a new one is created if omitted
+            on_sql: Optional callback receiving the SQL as soon as it is
+                generated (see convert)
+            tables: Tables already retrieved for this question, or a task
+                retrieving them that the caller has started (and still
+                owns); retrieved here if omitted
+        
+        Returns:
+            Dictionary with 'sql', 'explanation', and 'confidence'
+        """
+        logger.info(f"Converting NL query (async): {natural_language_query}")
+        
+        # Retrieve tables while the caches are probed; abandoned on a hit
+        # unless the caller started the retrieval
+        retrieval = None
+        owns_retrieval = False
+        if tables is not None and not isinstance(tables, list):
+            retrieval, tables = asyncio.ensure_future(tables), None
+        elif tables is None and self.rag_retriever and settings.rag_enabled:
+            logger.info("Using RAG to retrieve relevant tables")
+            retrieval = asyncio.ensure_future(self.rag_retriever.aretrieve(natural_language_query))
+            owns_retrieval = True
+        
+        try:
+            cached, slot = await asyncio.to_thread(self._cache_lookup, natural_language_query, context)
+            if cached is not None:
+                if on_sql is not None:
+                    on_sql(cached["sql"])
+                return cached
+            
+            if retrieval is not None:
+                try:
+                    tables = await retrieval
+                except Exception as e:
+                    # An empty list makes the schema context fall back to all tables
+                    logger.error(f"RAG retrieval failed: {e}, falling back to all tables")
+                    tables = []
+            
+            prompt = await asyncio.to_thread(self._prepare_prompt, natural_language_query, context, tables)
+            
+            logger.info("Calling Ollama API (async)...")
+            client = client or get_async_client()
+            request = dict(
+                model=settings.llm_model,
+                prompt=prompt,
+                options={"temperature": settings.llm_temperature},
+                keep_alive=settings.ollama_keep_alive
+            )
+            if on_sql is None:
+                response = await client.generate(**request)
+                response_text = response["response"]
+            else:
+                watcher = _SQLFenceWatcher(on_sql)
+                chunks = []
+                async for part in await client.generate(stream=True, **request):
+                    chunks.append(part["response"])
+                    watcher.feed(part["response"])
+                response_text = "".join(chunks)
+            logger.debug(f"Response text length: {len(response_text)} characters")
+            
+            result = self._parse_response(response_text)
+            logger.info(f"SQL generated successfully: {result['sql'][:100]}...")
+            
+            await asyncio.to_thread(self._cache_store, slot, result)
+            return result
+        
+        except Exception as e:
+            logger.error(f"Failed to convert NL to SQL: {e}")
+            raise
+        finally:
+            if owns_retrieval and not retrieval.done():
+                retrieval.cancel()
+    
+    async def aconvert_many(self, queries: List[str], context: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Convert several questions concurrently.
+        
+        At most settings.llm_max_parallel generations are in flight at once;
+        the Ollama server only runs them in parallel when started with
+        OLLAMA_NUM_PARALLEL of at least that value.
+        
+        Tables for all questions are retrieved up front with one batched
+        embedding and vector search.
+        
+        Returns:
+            Results in the same order as queries
+        """
+        tables_per_query: List[Optional[List[str]]] = [None] * len(queries)
+        if self.rag_retriever and settings.rag_enabled:
+            tables_per_query = await asyncio.to_thread(self.rag_retriever.retrieve_many, queries)
+        
+        client = get_async_client()
+        semaphore = asyncio.Semaphore(settings.llm_max_parallel)
+        
+        async def run(query: str, tables: Optional[List[str]]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.aconvert(query, context, client, tables=tables)
+        
+        return await asyncio.gather(*(run(q, t) for q, t in zip(queries, tables_per_query)))
+    
+    def convert_many(self, queries: List[str], context: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Synchronous wrapper around aconvert_many.
+        
+        Must not be called from a running event loop; await aconvert_many
+        there instead.
+        """
+        logger.info(f"Converting batch of {len(queries)} NL queries")
+        return asyncio.run(self.aconvert_many(queries, context))
+    
+    def _cache_lookup(self, query: str, context: Optional[str]) -> Tuple[Optional[Dict[str, Any]], Tuple]:
+        """
+        Probe the exact-match and semantic caches.
+        
+        Returns:
+            Tuple of (cached result or None, slot); pass the slot to
+            _cache_store once a fresh result has been generated
+        """
+        # Everything besides the question that shapes the response
+        config_key = LLMCache.make_key(
+            PROMPT_VERSION,
+            settings.llm_model,
+            settings.llm_temperature,
+            self.schema_manager.get_schema_fingerprint()
+        )
+        
+        # Exact-match cache lookup
+        cache_key = None
+        if self.cache is not None:
+            cache_key = LLMCache.make_key(config_key, query, context or "")
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("NL2SQL result served from cache")
+                return cached, ()
+        
+        # Semantic cache lookup for paraphrases (context-free questions only)
+        embedding = None
+        semantic_key = (config_key, tuple(_LITERAL_RE.findall(query)))
+        if self.semantic_cache is not None and not context:
+            embedding, cached = self._semantic_lookup(query, semantic_key)
+            if cached is not None:
+                logger.info("NL2SQL result served from semantic cache")
+                return cached, ()
+        
+        return None, (semantic_key, cache_key, embedding)
+    
+    def _cache_store(self, slot: Tuple, result: Dict[str, Any]):
+        """Store a freshly generated result in the caches probed by _cache_lookup."""
+        if not result["sql"]:
+            return
+        
+        semantic_key, cache_key, embedding = slot
+        if cache_key is not None:
+            self.cache.set(cache_key, result, settings.llm_model, PROMPT_VERSION)
+        if embedding is not None:
+            self.semantic_cache.set(embedding, result, semantic_key)
+    
+    def _prepare_prompt(self, query: str, context: Optional[str], tables: Optional[List[str]] = None) -> str:
+        """Retrieve schema context and build the full prompt."""
+        schema_context = self._get_schema_context(query, tables)
+        logger.debug(f"Schema context retrieved: {len(schema_context)} characters")
+        
+        prompt = self._build_prompt(query, schema_context, context)
+        logger.debug("Prompt built successfully")
+        return prompt
+    
+    def _semantic_lookup(self, query: str, semantic_key: Tuple[str, Tuple[str, ...]]):
+        """
+        Embed the query and probe the semantic cache.
+        
+        Returns:
+            Tuple of (embedding, cached result or None). The embedding is None
+            if embedding failed, in which case the result is not cached either.
+        """
+        try:
+            embedding = embed_texts([query])[0]
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding failed: {e}")
+            return None, None
+        
+        # Entries from a different model, prompt or schema, or with other
+        # numbers or quoted values in the question, are misses
+        return embedding, self.semantic_cache.get(embedding, settings.semantic_cache_threshold, semantic_key)
+    
+    def cache_clear(self):
+        """Drop all cached NL2SQL responses."""
+        if self.cache is not None:
+            self.cache.clear()
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
+    
+    def _get_schema_context(self, query: str, tables: Optional[List[str]] = None) -> str:
         """
         Get relevant schema context for the query.
         Uses RAG retriever if available, otherwise includes all tables.
+        
+        Args:
+            query: User's question
+            tables: Tables already retrieved for the question, if any
         """
         logger.debug("Retrieving schema context")
         
         # Try to use RAG retriever if available and enabled
-        if self.rag_retriever and settings.rag_enabled:
+        if tables is None and self.rag_retriever and settings.rag_enabled:
             try:
                 logger.info("Using RAG to retrieve relevant tables")
                 tables = self.rag_retriever.retrieve(query)
-                
-                if not tables:
-                    logger.warning("RAG returned no tables, falling back to all tables")
-                    tables = self.schema_manager.get_all_tables()
-                else:
-                    logger.info(f"RAG retrieved {len(tables)} relevant tables: {', '.join(tables)}")
             except Exception as e:
                 logger.error(f"RAG retrieval failed: {e}, falling back to all tables")
                 tables = self.schema_manager.get_all_tables()
-        else:
+        
+        if tables is None:
             # Use all tables if RAG is not available
             logger.debug("RAG not available, using all tables")
             tables = self.schema_manager.get_all_tables()
+        elif not tables:
+            logger.warning("RAG returned no tables, falling back to all tables")
+            tables = self.schema_manager.get_all_tables()
+        else:
+            logger.info(f"Using {len(tables)} relevant tables: {', '.join(tables)}")
         
-        # Build context string
-        context_parts = []
+        # Keep keys plus the columns that best match the question
+        schema = self.schema_manager.get_all_schema_bulk()
+        terms = self._query_terms(query)
+        selection = []
+        # Retrieval order (most relevant first), duplicates dropped
+        for table_name in dict.fromkeys(tables):
+            if table_name not in schema:
+                logger.warning(f"Skipping unknown table in schema context: {table_name}")
+                continue
+            meta = schema[table_name]
+            selection.append((table_name, self._select_columns(meta["columns"], meta["foreign_keys"], terms)))
         
-        for table_name in tables:
-            table_info = self.schema_manager.get_table_info(table_name, include_samples=True)
-            
-            # Table header
-            context_parts.append(f"\nTable: {table_name} ({table_info.row_count} rows)")
-            
-            # Columns
-            context_parts.append("Columns:")
-            for col in table_info.columns:
-                pk = " [PRIMARY KEY]" if col.primary_key else ""
-                null = " NULL" if col.nullable else " NOT NULL"
-                context_parts.append(f"  - {col.name}: {col.type}{null}{pk}")
-            
-            # Foreign keys
-            fks = self.schema_manager.get_foreign_keys(table_name)
-            if fks:
-                context_parts.append("Foreign Keys:")
-                for fk in fks:
-                    context_parts.append(
-                        f"  - {fk['column']} -> {fk['referenced_table']}.{fk['referenced_column']}"
-                    )
-            
-            # Sample data (only first 2 rows to save tokens)
-            if table_info.sample_data:
-                context_parts.append("Sample Data (first 2 rows):")
-                for i, row in enumerate(table_info.sample_data[:2], 1):
-                    context_parts.append(f"  Row {i}: {dict(row)}")
+        # Reuse each table's rendered fragment across questions, so a table
+        # that appears in many retrievals is formatted once per schema
+        # version and column selection
+        version = self.schema_manager.schema_version
+        rendered = {}
+        missing = []
+        with self._fragment_lock:
+            if self._fragment_version != version:
+                self._fragment_cache.clear()
+                self._fragment_version = version
+            for entry in selection:
+                fragment = self._fragment_cache.get(entry)
+                if fragment is None:
+                    missing.append(entry)
+                else:
+                    self._fragment_cache.move_to_end(entry)
+                    rendered[entry[0]] = fragment
+        logger.debug(f"Schema context fragments: {len(selection) - len(missing)} cached, {len(missing)} rendered")
+        
+        # One compact line per table, plus sample rows for small tables
+        for table_name, kept in missing:
+            meta = schema[table_name]
+            table_info = self.schema_manager.get_table_info(table_name, include_samples=False)
+            samples = []
+            if meta["row_count"] <= self._SAMPLE_MAX_ROWS and len(meta["columns"]) <= self._SAMPLE_MAX_COLUMNS:
+                table_info_samples = self.schema_manager.get_table_info(table_name, include_samples=True)
+                if len(kept) == len(meta["columns"]):
+                    rows = table_info_samples.sample_data_rendered[:2]
+                else:
+                    rows = [
+                        str({name: row.get(name) for name in kept})
+                        for row in table_info_samples.sample_data[:2]
+                    ]
+                samples = [f"{table_name}: {row}" for row in rows]
+            rendered[table_name] = (self._render_table(table_info, meta, kept), samples)
+        
+        if missing:
+            with self._fragment_lock:
+                if self._fragment_version == version:
+                    for entry in missing:
+                        self._fragment_cache[entry] = rendered[entry[0]]
+                    while len(self._fragment_cache) > self._FRAGMENT_CACHE_SIZE:
+                        self._fragment_cache.popitem(last=False)
+        
+        # Assembled in retrieval order so the budget drops the least
+        # relevant tables
+        
+        budget = settings.schema_context_max_tokens * _CHARS_PER_TOKEN
+        table_lines = [rendered[table_name][0] for table_name, _ in selection]
+        sample_lines = [line for table_name, _ in selection for line in rendered[table_name][1]]
+        
+        # Drop samples first, then trailing tables, to stay within the budget
+        context_parts = table_lines
+        if sample_lines:
+            with_samples = table_lines + ["", "Sample rows:"] + sample_lines
+            if sum(len(line) + 1 for line in with_samples) <= budget:
+                context_parts = with_samples
+        
+        size = sum(len(line) + 1 for line in context_parts)
+        while size > budget and len(context_parts) > 1:
+            dropped = context_parts.pop()
+            size -= len(dropped) + 1
+            logger.warning(f"Schema context over budget, omitted: {dropped.split('(', 1)[0]}")
         
         context = "\n".join(context_parts)
         logger.debug(f"Schema context size: {len(context)} characters")
         return context
     
+    @staticmethod
+    def _query_terms(query: str) -> Set[str]:
+        """Lowercase question words, their singular forms and column synonyms."""
+        words = set(_WORD_RE.findall(query.lower()))
+        terms = set(words)
+        for word in words:
+            if len(word) > 3 and word.endswith("s"):
+                terms.add(word[:-1])
+            terms.update(_COLUMN_SYNONYMS.get(word, ()))
+        return terms
+    
+    def _select_columns(self, columns, foreign_keys: List[Dict[str, str]], terms: Set[str]) -> Tuple[str, ...]:
+        """
+        Pick the columns to describe for a table.
+        
+        Primary and foreign key columns are always kept; of the rest, the
+        _TOP_COLUMNS sharing the most words with the question are kept
+        (schema order breaks ties).
+        
+        Returns:
+            Kept column names in schema order
+        """
+        fk_columns = {fk['column'] for fk in foreign_keys}
+        others = [col for col in columns if not col.primary_key and col.name not in fk_columns]
+        if len(others) <= self._TOP_COLUMNS:
+            return tuple(col.name for col in columns)
+        
+        ranked = sorted(others, key=lambda col: -len(terms.intersection(col.name.lower().split("_"))))
+        top = {col.name for col in ranked[:self._TOP_COLUMNS]}
+        return tuple(
+            col.name for col in columns
+            if col.primary_key or col.name in fk_columns or col.name in top
+        )
+    
+    @staticmethod
+    def _render_table(table_info, meta: Dict[str, Any], kept: Tuple[str, ...]) -> str:
+        """Render one table as a compact line, e.g. ``orders(id INTEGER PK, ...) -- 10 rows``."""
+        references = {
+            fk['column']: f" -> {fk['referenced_table']}.{fk['referenced_column']}"
+            for fk in meta["foreign_keys"]
+        }
+        rendered = table_info.rendered_columns
+        
+        columns = [rendered[name] + references.get(name, "") for name in kept]
+        if len(kept) < len(meta["columns"]):
+            columns.append("...")
+        
+        return f"{table_info.name}({', '.join(columns)}) -- {meta['row_count']} rows"
+    
     def _build_prompt(self, query: str, schema_context: str, additional_context: Optional[str] = None) -> str:
-        """Build the prompt for Ollama."""
+        """
+        Build the prompt for Ollama.
         
-        prompt = f"""You are an expert SQL query generator. Convert the natural language question into a valid SQLite query.
-
-DATABASE SCHEMA:
-{schema_context}
-
-IMPORTANT RULES:
-1. Generate ONLY valid SQLite syntax
-2. Use proper table and column names from the schema
-3. Include appropriate JOINs when querying multiple tables
-4. Use aliases for better readability
-5. Add LIMIT clause for queries that might return many rows
-6. Return results in a logical order (use ORDER BY)
-7. Use aggregate functions (COUNT, SUM, AVG, etc.) when appropriate
-
-USER QUESTION:
-{query}
-
-RESPONSE FORMAT:
-Provide your response in the following format:
-
-SQL:
-```sql
-[Your SQL query here]
-```
-
-EXPLANATION:
-[Brief explanation of what the query does and why you structured it this way]
-
-CONFIDENCE:
-[High/Medium/Low - your confidence in this query]
-
-Now generate the SQL query:"""
-
+        Sections run from most to least stable so consecutive prompts share
+        the longest possible prefix and Ollama can reuse its KV cache: fixed
+        instructions, the full schema summary (constant per schema version),
+        the tables retrieved for this question, then the question itself.
+        """
+        parts = [
+            self._PROMPT_HEAD, self.schema_manager.get_compact_schema_summary(),
+            self._PROMPT_TABLES, schema_context, "\n"
+        ]
         if additional_context:
-            prompt += f"\n\nADDITIONAL CONTEXT:\n{additional_context}"
+            parts += [self._PROMPT_CONTEXT, additional_context, "\n"]
+        parts += [self._PROMPT_QUESTION, query, self._PROMPT_TAIL]
         
-        return prompt
+        return "".join(parts)
     
     def _parse_response(self, response_text: str) -> Dict[str, Any]:
         """Parse Ollama's response to extract SQL, explanation, and confidence."""
@@ -189,6 +637,14 @@ Now generate the SQL query:"""
             "confidence": "medium"
         }
         
+        # Fast path: all sections in a single scan
+        match = _RESPONSE_RE.search(response_text)
+        if match:
+            result["sql"] = match.group("sql").strip()
+            result["explanation"] = match.group("expl").strip()
+            result["confidence"] = self._parse_confidence(match.group("conf") or "")
+            return result
+        
         try:
             # Extract SQL
             if "```sql" in response_text:
@@ -222,32 +678,13 @@ Now generate the SQL query:"""
             # Extract confidence
             if "CONFIDENCE:" in response_text:
                 conf_start = response_text.find("CONFIDENCE:") + 11
-                conf_text = response_text[conf_start:].strip().lower()
-                if "high" in conf_text:
-                    result["confidence"] = "high"
-                elif "low" in conf_text:
-                    result["confidence"] = "low"
-                else:
-                    result["confidence"] = "medium"
+                result["confidence"] = self._parse_confidence(response_text[conf_start:])
             
             # If SQL is still empty, try to extract any SELECT statement
-            if not result["sql"] and "SELECT" in response_text.upper():
-                # Find the first SELECT and try to extract the query
-                select_start = response_text.upper().find("SELECT")
-                # Find the end (look for semicolon or double newline)
-                select_text = response_text[select_start:]
-                if ";" in select_text:
-                    result["sql"] = select_text[:select_text.find(";") + 1].strip()
-                else:
-                    # Take until double newline or end
-                    lines = select_text.split("\n")
-                    sql_lines = []
-                    for line in lines:
-                        if line.strip():
-                            sql_lines.append(line)
-                        elif sql_lines:  # Empty line after we've started collecting
-                            break
-                    result["sql"] = "\n".join(sql_lines).strip()
+            if not result["sql"]:
+                match = _FALLBACK_SELECT_RE.search(response_text)
+                if match:
+                    result["sql"] = match.group(0).strip()
         
         except Exception as e:
             logger.error(f"Error parsing response: {e}")
@@ -255,3 +692,13 @@ Now generate the SQL query:"""
             result["sql"] = response_text.strip()
         
         return result
+    
+    @staticmethod
+    def _parse_confidence(conf_text: str) -> str:
+        """Map the CONFIDENCE section to high, medium or low."""
+        conf_text = conf_text.lower()
+        if "high" in conf_text:
+            return "high"
+        elif "low" in conf_text:
+            return "low"
+        return "medium"
@@ -0,0 +1,164 @@
+"""Semantic response cache using random-projection LSH over embeddings."""
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import threading
+import time
+import numpy as np
+from utils.logger import get_logger
+
+logger = get_logger("core.semantic_cache")
+
+
+class SemanticCache:
+    """
+    Caches results keyed by embedding vectors.
+
+    Each embedding is hashed into ``n_tables`` bit signatures using random
+    Gaussian projections. Lookups only score the entries that share a bucket
+    with the query in at least one table, then return the most similar entry
+    stored under the same key if its cosine similarity clears the threshold.
+
+    Cached embeddings are stored as int8 with a per-vector scale, a quarter
+    of the FP32 footprint; cosine similarity is computed on the quantized
+    vectors with integer accumulation.
+
+    Entries are evicted least-recently-used once ``max_entries`` is reached,
+    and expire after ``ttl_seconds`` when set. All methods are thread-safe.
+    """
+
+    def __init__(
+        self,
+        dim: Optional[int] = None,
+        n_tables: int = 8,
+        n_bits: int = 12,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[int] = None,
+        seed: int = 42
+    ):
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng(seed)
+        self._projections: Optional[np.ndarray] = None
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(n_tables)]
+        # entry id -> (int8 vector, scale * norm, signatures, value, created_at, key)
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, float, Tuple[bytes, ...], Any, float, Hashable]]" = OrderedDict()
+        self._next_id = 0
+
+        if dim is not None:
+            self._init_projections(dim)
+
+        logger.info(f"Semantic cache initialized (tables={n_tables}, bits={n_bits}, max={max_entries})")
+
+    def _init_projections(self, dim: int):
+        """Create the random projection matrices once the dimension is known."""
+        self._projections = self._rng.standard_normal((self.n_tables, dim, self.n_bits)).astype(np.float32)
+
+    def _signatures(self, emb: np.ndarray) -> Tuple[bytes, ...]:
+        """Hash an embedding into one bit signature per table."""
+        bits = np.einsum("d,tdb->tb", emb, self._projections) > 0
+        return tuple(np.packbits(row).tobytes() for row in bits)
+
+    def _as_vector(self, embedding) -> np.ndarray:
+        emb = np.asarray(embedding, dtype=np.float32)
+        if self._projections is None:
+            self._init_projections(emb.shape[0])
+        return emb
+
+    @staticmethod
+    def _quantize(emb: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Quantize to int8; returns the vector and its ``scale * norm`` factor."""
+        peak = float(np.max(np.abs(emb)))
+        scale = 127.0 / peak if peak > 0 else 1.0
+        quantized = np.round(emb * scale).astype(np.int8)
+        return quantized, scale * float(np.linalg.norm(emb))
+
+    def get(self, embedding, threshold: float = 0.95, key: Hashable = None) -> Optional[Any]:
+        """
+        Return the cached value most similar to ``embedding``.
+
+        Args:
+            embedding: Query embedding
+            threshold: Minimum cosine similarity for a hit
+            key: Only entries stored under this key are considered
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+
+            emb = self._as_vector(embedding)
+
+            # Union candidates across all hash tables
+            candidates = set()
+            for table, sig in zip(self._buckets, self._signatures(emb)):
+                candidates.update(table.get(sig, ()))
+
+            # Drop expired candidates before scoring
+            if self.ttl_seconds:
+                cutoff = time.time() - self.ttl_seconds
+                for entry_id in [i for i in candidates if self._entries[i][4] < cutoff]:
+                    self._evict(entry_id)
+                    candidates.discard(entry_id)
+
+            # Entries stored under another key never match, however similar
+            candidates = [i for i in candidates if self._entries[i][5] == key]
+            if not candidates:
+                return None
+
+            ids = candidates
+            query, query_factor = self._quantize(emb)
+            cached = np.stack([self._entries[i][0] for i in ids]).astype(np.int32)
+            factors = np.array([self._entries[i][1] for i in ids]) * query_factor
+            scores = (cached @ query.astype(np.int32)) / np.where(factors == 0, 1.0, factors)
+
+            best = int(np.argmax(scores))
+            if scores[best] < threshold:
+                return None
+
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            logger.debug(f"Semantic cache hit (similarity: {scores[best]:.3f})")
+            return self._entries[entry_id][3]
+
+    def set(self, embedding, value: Any, key: Hashable = None):
+        """Store ``value`` under ``embedding`` and ``key``, evicting the least recently used entry if full."""
+        with self._lock:
+            emb = self._as_vector(embedding)
+            signatures = self._signatures(emb)
+
+            quantized, factor = self._quantize(emb)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (quantized, factor, signatures, value, time.time(), key)
+            for table, sig in zip(self._buckets, signatures):
+                table.setdefault(sig, []).append(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+
+    def _evict(self, entry_id: int):
+        signatures = self._entries.pop(entry_id)[2]
+        for table, sig in zip(self._buckets, signatures):
+            bucket = table.get(sig)
+            if bucket is None:
+                continue
+            bucket.remove(entry_id)
+            if not bucket:
+                del table[sig]
+
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+            for table in self._buckets:
+                table.clear()
+        logger.info("Semantic cache cleared")
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,6 +1,10 @@
 """Query validator with multi-layer validation."""
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import re
+import sqlite3
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError
 from utils.logger import get_logger
 from database.schema_manager import SchemaManager
 from config.settings import settings
@@ -15,6 +19,11 @@ class QueryValidator:
     DANGEROUS_KEYWORDS = [
         "DROP", "DELETE", "TRUNCATE", "ALTER", "CREATE", "INSERT", "UPDATE"
     ]
+    _DANGEROUS_RE = re.compile(r'\b(' + '|'.join(DANGEROUS_KEYWORDS) + r')\b', re.IGNORECASE)
+    
+    # Keywords a query may start with when dangerous queries are disabled
+    _LEADING_KEYWORD_RE = re.compile(r'\s*(?:SELECT|WITH|EXPLAIN)(?:\s|$)', re.IGNORECASE)
+    _EXPLAIN_RE = re.compile(r'\s*EXPLAIN\b', re.IGNORECASE)
     
     def __init__(self, schema_manager: SchemaManager):
         self.schema_manager = schema_manager
@@ -33,6 +42,41 @@ class QueryValidator:
         logger.info("Validating SQL query")
         logger.debug(f"Query: {sql_query[:200]}...")
         
+        try:
+            statements = [s for s in sqlglot.parse(sql_query, read="sqlite") if s is not None]
+        except ParseError as e:
+            # sqlglot does not cover all of SQLite's grammar; defer to SQLite
+            if not self._sqlite_accepts(sql_query):
+                logger.error(f"Syntax validation failed: {e}")
+                return False, ["Invalid SQL syntax"]
+            logger.debug(f"sqlglot could not parse the query, SQLite accepts it: {e}")
+            return self.validate_parsed(sql_query, None)
+        except Exception as e:
+            logger.error(f"Validation error: {e}")
+            return False, [f"Validation error: {str(e)}"]
+        
+        if len(statements) > 1:
+            logger.error(f"Query contains {len(statements)} statements")
+            return False, ["Only a single SQL statement is allowed"]
+        if not statements:
+            logger.error("Syntax validation failed")
+            return False, ["Invalid SQL syntax"]
+        
+        return self.validate_parsed(sql_query, statements[0])
+    
+    def validate_parsed(self, sql_query: str, parsed: Optional[exp.Expression]) -> Tuple[bool, List[str]]:
+        """
+        Validate a single SQL statement that has already been parsed.
+        
+        Args:
+            sql_query: Original SQL query text
+            parsed: sqlglot expression tree for the statement, or None if
+                sqlglot cannot parse it; the schema and performance layers
+                are then skipped
+        
+        Returns:
+            Tuple of (is_valid, warnings)
+        """
         warnings = []
         
         try:
@@ -53,15 +97,20 @@ class QueryValidator:
                     logger.warning(f"Safety warnings (allowed): {safety_warnings}")
             logger.debug("✓ Safety validation passed")
             
+            if parsed is None:
+                warnings.append("Query could not be analyzed; table and performance checks were skipped")
+                logger.info(f"Validation successful with {len(warnings)} warnings")
+                return True, warnings
+            
             # Layer 3: Schema validation
-            schema_warnings = self._validate_schema(sql_query)
+            schema_warnings = self._validate_schema(parsed)
             if schema_warnings:
                 warnings.extend(schema_warnings)
                 logger.warning(f"Schema warnings: {schema_warnings}")
             logger.debug("✓ Schema validation passed")
             
             # Layer 4: Performance estimation
-            perf_warnings = self._estimate_performance(sql_query)
+            perf_warnings = self._estimate_performance(parsed)
             if perf_warnings:
                 warnings.extend(perf_warnings)
                 logger.info(f"Performance warnings: {perf_warnings}")
@@ -87,52 +136,64 @@ class QueryValidator:
             return False
         
         # Check if it starts with a valid SQL keyword
-        first_word = sql_query.strip().split()[0].upper()
-        valid_keywords = ["SELECT", "WITH", "EXPLAIN"]
-        
         if not settings.enable_dangerous_queries:
-            if first_word not in valid_keywords:
-                logger.debug(f"Query starts with invalid keyword: {first_word}")
+            if not self._LEADING_KEYWORD_RE.match(sql_query):
+                logger.debug(f"Query starts with invalid keyword: {sql_query.split(None, 1)[0]}")
                 return False
         
         return True
     
+    def _sqlite_accepts(self, sql_query: str) -> bool:
+        """Check that SQLite compiles the query as exactly one statement."""
+        statement = sql_query.strip()
+        if not statement or not sqlite3.complete_statement(statement if statement.endswith(";") else statement + ";"):
+            return False
+        
+        # EXPLAIN compiles the statement without running it
+        if not self._EXPLAIN_RE.match(statement):
+            statement = f"EXPLAIN {statement}"
+        try:
+            with self.schema_manager.db.get_connection() as conn:
+                conn.execute(statement).close()
+        except (sqlite3.Error, sqlite3.Warning) as e:
+            # Includes "You can only execute one statement at a time"
+            logger.debug(f"SQLite rejected the query: {e}")
+            return False
+        return True
+    
     def _validate_safety(self, sql_query: str) -> List[str]:
         """Check for dangerous operations."""
-        warnings = []
-        query_upper = sql_query.upper()
+        # Match case-insensitively on the original text; only the matched
+        # keywords are upper-cased
+        found = {keyword.upper() for keyword in self._DANGEROUS_RE.findall(sql_query)}
         
+        warnings = []
         for keyword in self.DANGEROUS_KEYWORDS:
-            if re.search(rf'\b{keyword}\b', query_upper):
+            if keyword in found:
                 warnings.append(f"Dangerous operation detected: {keyword}")
                 logger.warning(f"Dangerous keyword found: {keyword}")
         
         return warnings
     
-    def _validate_schema(self, sql_query: str) -> List[str]:
-        """Validate table and column references."""
+    def _validate_schema(self, parsed: exp.Expression) -> List[str]:
+        """Validate table references."""
         warnings = []
         
         try:
             # Get all valid table names
-            valid_tables = set(self.schema_manager.get_all_tables())
-            
-            # Extract table names from query (simple regex approach)
-            # This is a simplified version; a full parser would be more robust
-            table_pattern = r'\bFROM\s+(\w+)|\bJOIN\s+(\w+)'
-            matches = re.findall(table_pattern, sql_query, re.IGNORECASE)
+            valid_tables = self.schema_manager.table_name_set_lower
             
-            referenced_tables = set()
-            for match in matches:
-                for table in match:
-                    if table:
-                        referenced_tables.add(table.lower())
+            # Tables referenced anywhere in the tree (subqueries, CTE bodies,
+            # quoted names); CTE names are not schema tables
+            cte_names = {cte.alias_or_name.lower() for cte in parsed.find_all(exp.CTE)}
+            referenced_tables = {
+                table.name.lower() for table in parsed.find_all(exp.Table)
+            } - cte_names
             
             # Check if referenced tables exist
-            for table in referenced_tables:
-                if table not in [t.lower() for t in valid_tables]:
-                    warnings.append(f"Table '{table}' not found in schema")
-                    logger.warning(f"Unknown table referenced: {table}")
+            for table in sorted(referenced_tables - valid_tables):
+                warnings.append(f"Table '{table}' not found in schema")
+                logger.warning(f"Unknown table referenced: {table}")
         
         except Exception as e:
             logger.error(f"Schema validation error: {e}")
@@ -140,24 +201,28 @@ class QueryValidator:
         
         return warnings
     
-    def _estimate_performance(self, sql_query: str) -> List[str]:
+    def _estimate_performance(self, parsed: exp.Expression) -> List[str]:
         """Estimate query performance and provide warnings."""
         warnings = []
-        query_upper = sql_query.upper()
         
-        # Check for SELECT * without LIMIT
-        if "SELECT *" in query_upper and "LIMIT" not in query_upper:
-            warnings.append("Query uses SELECT * without LIMIT - may return many rows")
-            logger.info("Performance warning: SELECT * without LIMIT")
+        # Check for SELECT * (or t.*) in the outer query without LIMIT
+        if isinstance(parsed, exp.Select) and parsed.args.get("limit") is None:
+            selects_star = any(
+                isinstance(e, exp.Star) or (isinstance(e, exp.Column) and isinstance(e.this, exp.Star))
+                for e in parsed.expressions
+            )
+            if selects_star:
+                warnings.append("Query uses SELECT * without LIMIT - may return many rows")
+                logger.info("Performance warning: SELECT * without LIMIT")
         
         # Check for multiple JOINs
-        join_count = query_upper.count("JOIN")
+        join_count = sum(1 for _ in parsed.find_all(exp.Join))
         if join_count > 3:
             warnings.append(f"Query has {join_count} JOINs - may be slow")
             logger.info(f"Performance warning: {join_count} JOINs")
         
-        # Check for subqueries
-        if "SELECT" in query_upper[10:]:  # Skip first SELECT
+        # Check for subqueries (scalar, IN (...) and EXISTS)
+        if parsed.find(exp.Subquery, exp.Exists) is not None:
             warnings.append("Query contains subqueries - verify performance")
             logger.info("Performance warning: Subqueries detected")
         
@@ -1,20 +1,49 @@
 """Database connection manager with connection pooling."""
+import queue
+import re
 import sqlite3
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from contextlib import contextmanager
 from pathlib import Path
+from config.settings import settings
 from utils.logger import get_logger
 
 logger = get_logger("database.connection")
 
+# Per-connection settings applied when a connection is opened
+_CONNECTION_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+# Applied as well when settings.db_wal_mode is enabled; journal_mode=WAL
+# persists in the database file
+_WAL_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+)
+
+# Statements that return rows rather than modifying data
+_READ_QUERY_RE = re.compile(r"\s*(?:SELECT|PRAGMA)", re.IGNORECASE)
+
 
 class DatabaseConnection:
     """Manages database connections with proper error handling."""
     
-    def __init__(self, database_path: str):
+    def __init__(self, database_path: str, pool_size: Optional[int] = None):
         self.database_path = database_path
         self.connection: Optional[sqlite3.Connection] = None
-        logger.info(f"Database connection manager initialized for: {database_path}")
+        self.pool_size = pool_size or settings.db_pool_size
+        
+        # Most recently returned connection is handed out first, keeping
+        # its page cache warm. Connections are opened on demand, up to
+        # pool_size of them.
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=self.pool_size)
+        self._opened = 0
+        self._open_lock = threading.Lock()
+        
+        logger.info(f"Database connection manager initialized for: {database_path} (pool size: {self.pool_size})")
     
     def connect(self):
         """Establish database connection."""
@@ -25,7 +54,6 @@ class DatabaseConnection:
                 logger.info("Database will be created on first connection")
             
             self.connection = sqlite3.connect(self.database_path)
-            self.connection.row_factory = sqlite3.Row  # Enable column access by name
             logger.info(f"Successfully connected to database: {self.database_path}")
             return self.connection
         
@@ -40,24 +68,77 @@ class DatabaseConnection:
             logger.info("Database connection closed")
             self.connection = None
     
+    def _open(self) -> sqlite3.Connection:
+        """
+        Open a new tuned connection.
+        
+        Connections run in autocommit mode (isolation_level=None); writers
+        wrap their statements in an explicit BEGIN/COMMIT.
+        """
+        # Streaming readers may be advanced from different worker threads
+        conn = sqlite3.connect(self.database_path, check_same_thread=False, isolation_level=None)
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if settings.db_wal_mode:
+            for pragma in _WAL_PRAGMAS:
+                conn.execute(pragma)
+        logger.debug("Database connection opened")
+        return conn
+    
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections."""
-        conn = None
+        """
+        Context manager borrowing a connection from the pool.
+        
+        A new connection is opened while fewer than pool_size exist;
+        otherwise this blocks until one is free, up to
+        settings.db_pool_timeout seconds. The connection is returned to the
+        pool when the block exits. With settings.db_wal_mode, readers on
+        different pooled connections do not block each other.
+        
+        Raises:
+            TimeoutError: If no connection became free in time
+        """
+        conn = self._acquire()
         try:
-            conn = sqlite3.connect(self.database_path)
-            conn.row_factory = sqlite3.Row
-            logger.debug("Database connection acquired")
             yield conn
         except sqlite3.Error as e:
             logger.error(f"Database error: {e}")
-            if conn:
-                conn.rollback()
             raise
         finally:
-            if conn:
-                conn.close()
-                logger.debug("Database connection released")
+            # Never hand a connection with an open transaction to the next caller
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+    
+    def _acquire(self) -> sqlite3.Connection:
+        """Take an idle pooled connection, opening one if the pool is not full."""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._open_lock:
+            can_open = self._opened < self.pool_size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._open_lock:
+                    self._opened -= 1
+                raise
+        
+        try:
+            return self._pool.get(timeout=settings.db_pool_timeout)
+        except queue.Empty:
+            logger.error(f"No database connection free after {settings.db_pool_timeout}s (pool size: {self.pool_size})")
+            raise TimeoutError(
+                f"Timed out after {settings.db_pool_timeout}s waiting for one of "
+                f"{self.pool_size} pooled database connections; raise DB_POOL_SIZE "
+                f"or DB_POOL_TIMEOUT"
+            ) from None
     
     def execute_query(
         self, 
@@ -80,25 +161,32 @@ class DatabaseConnection:
         if params:
             logger.debug(f"Query parameters: {params}")
         
+        # Check if it's a query that returns results (SELECT or PRAGMA)
+        is_read = _READ_QUERY_RE.match(query) is not None
+        
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
             try:
+                # Writes run in an explicit transaction
+                if not is_read:
+                    cursor.execute("BEGIN")
+                
                 if params:
                     cursor.execute(query, params)
                 else:
                     cursor.execute(query)
                 
-                # Check if it's a query that returns results (SELECT or PRAGMA)
-                query_upper = query.strip().upper()
-                if query_upper.startswith("SELECT") or query_upper.startswith("PRAGMA"):
+                if is_read:
                     if fetch_all:
                         rows = cursor.fetchall()
                     else:
-                        rows = [cursor.fetchone()] if cursor.fetchone() else []
+                        row = cursor.fetchone()
+                        rows = [row] if row else []
                     
-                    # Convert Row objects to dictionaries
-                    results = [dict(row) for row in rows if row]
+                    # Build dictionaries from plain tuples, naming columns once
+                    columns = [d[0] for d in cursor.description]
+                    results = [dict(zip(columns, row)) for row in rows]
                     logger.info(f"Query executed successfully. Rows returned: {len(results)}")
                     return results
                 else:
@@ -112,6 +200,84 @@ class DatabaseConnection:
                 logger.error(f"Failed query: {query}")
                 raise
     
+    def iter_query(
+        self,
+        query: str,
+        params: Optional[tuple] = None,
+        batch: int = 200
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Execute a read query and yield its rows in batches.
+        
+        Rows are fetched with cursor.fetchmany, so at most one batch is held
+        in memory at a time. The connection stays open until the generator
+        is exhausted or closed.
+        
+        Args:
+            query: SQL query to execute
+            params: Query parameters (for parameterized queries)
+            batch: Number of rows per yielded batch
+        
+        Yields:
+            Lists of dictionaries representing rows
+        """
+        logger.debug(f"Streaming query: {query[:100]}...")
+        
+        # The cursor stays open across yields and may be advanced from other
+        # threads, so it gets a dedicated connection rather than holding a
+        # pooled one for the generator's lifetime
+        conn = self._open()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params or ())
+            if cursor.description is None:
+                # Not a row-returning statement; nothing to stream
+                logger.info(f"Query executed successfully. Rows affected: {cursor.rowcount}")
+                return
+            columns = [d[0] for d in cursor.description]
+            
+            total = 0
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    break
+                total += len(rows)
+                yield [dict(zip(columns, row)) for row in rows]
+            
+            logger.info(f"Query streamed successfully. Rows returned: {total}")
+        
+        except sqlite3.Error as e:
+            logger.error(f"Query execution failed: {e}")
+            logger.error(f"Failed query: {query}")
+            raise
+        finally:
+            conn.close()
+    
+    def validate_and_execute(
+        self,
+        query: str,
+        validator
+    ) -> Tuple[bool, List[str], List[Dict[str, Any]]]:
+        """
+        Validate a query and execute it if it passes.
+        
+        A convenience for callers that always do both; the validator and
+        SQLite each parse the query themselves.
+        
+        Args:
+            query: SQL query to validate and execute
+            validator: QueryValidator used to check the query
+        
+        Returns:
+            Tuple of (is_valid, warnings, results); results is empty when invalid
+        """
+        is_valid, warnings = validator.validate(query)
+        if not is_valid:
+            logger.warning(f"Query rejected by validator: {warnings}")
+            return False, warnings, []
+        
+        return True, warnings, self.execute_query(query)
+    
     def execute_script(self, script: str):
         """Execute a SQL script (multiple statements)."""
         logger.info("Executing SQL script")
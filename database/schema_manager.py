@@ -1,12 +1,33 @@
 """Schema manager for extracting and caching database metadata."""
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple, FrozenSet
+from dataclasses import dataclass, field, replace
+import hashlib
+import threading
+import time
+from config.settings import settings
 from utils.logger import get_logger
 
 logger = get_logger("database.schema_manager")
 
+# Columns and foreign keys of every user table, each in a single query
+_COLUMNS_QUERY = """
+    SELECT m.name, p.name, p.type, p."notnull", p.dflt_value, p.pk
+    FROM sqlite_master AS m
+    JOIN pragma_table_info(m.name) AS p
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+    ORDER BY m.name, p.cid
+"""
 
-@dataclass
+_FOREIGN_KEYS_QUERY = """
+    SELECT m.name, f."from", f."table", f."to"
+    FROM sqlite_master AS m
+    JOIN pragma_foreign_key_list(m.name) AS f
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+    ORDER BY m.name, f.id, f.seq
+"""
+
+
+@dataclass(slots=True)
 class ColumnInfo:
     """Information about a database column."""
     name: str
@@ -23,6 +44,20 @@ class TableInfo:
     columns: List[ColumnInfo]
     row_count: int
     sample_data: List[Dict[str, Any]]
+    # sample_data rows pre-rendered as strings for prompt building
+    sample_data_rendered: List[str] = field(default_factory=list)
+    # Column name -> compact description, e.g. "id INTEGER PK"
+    rendered_columns: Dict[str, str] = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        self.rendered_columns = {}
+        for col in self.columns:
+            parts = [col.name, col.type] if col.type else [col.name]
+            if col.primary_key:
+                parts.append("PK")
+            elif not col.nullable:
+                parts.append("NOT NULL")
+            self.rendered_columns[col.name] = " ".join(parts)
 
 
 class SchemaManager:
@@ -31,6 +66,25 @@ class SchemaManager:
     def __init__(self, db_connection):
         self.db = db_connection
         self._schema_cache: Dict[str, TableInfo] = {}
+        # Monotonic time each table's sample rows were last read
+        self._sample_fetched_at: Dict[str, float] = {}
+        # Bumped whenever cached metadata is invalidated so dependent caches
+        # can tell when to rebuild; see the schema_version property
+        self._version: int = 0
+        self._db_schema_version: Optional[int] = None
+        self._version_checked_at: float = float("-inf")
+        self._version_lock = threading.Lock()
+        self._bulk_schema_cache: Optional[Dict[str, Dict[str, Any]]] = None
+        self._bulk_schema_version: int = -1
+        self._bulk_schema_fetched_at: float = 0.0
+        self._fingerprint: Optional[str] = None
+        self._fingerprint_version: int = -1
+        self._compact_summary: Optional[str] = None
+        self._compact_summary_version: int = -1
+        self._tables_lower: Optional[FrozenSet[str]] = None
+        self._tables_lower_version: int = -1
+        self._foreign_keys: Dict[str, List[Dict[str, str]]] = {}
+        self._foreign_keys_version: int = -1
         logger.info("Schema manager initialized")
     
     def get_all_tables(self) -> List[str]:
@@ -50,6 +104,45 @@ class SchemaManager:
         logger.info(f"Found {len(tables)} tables: {', '.join(tables)}")
         return tables
     
+    @property
+    def schema_version(self) -> int:
+        """
+        Version of the cached schema metadata.
+        
+        SQLite bumps PRAGMA schema_version on every DDL change, from any
+        connection. It is re-read at most every
+        settings.schema_version_check_interval seconds, keeping database
+        round trips off the hot path, and a change invalidates the cached
+        metadata, so caches keyed on this version pick up migrations without
+        a restart.
+        """
+        now = time.monotonic()
+        if now - self._version_checked_at < settings.schema_version_check_interval:
+            return self._version
+        
+        with self.db.get_connection() as conn:
+            db_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        self._version_checked_at = now
+        
+        if db_version != self._db_schema_version:
+            with self._version_lock:
+                if db_version != self._db_schema_version:
+                    if self._db_schema_version is not None:
+                        logger.info(f"Database schema changed (schema_version {db_version})")
+                    self._db_schema_version = db_version
+                    self._invalidate()
+        
+        return self._version
+    
+    @property
+    def table_name_set_lower(self) -> FrozenSet[str]:
+        """Lowercased table names, re-read only when the schema version changes."""
+        if self._tables_lower is None or self._tables_lower_version != self.schema_version:
+            version = self.schema_version
+            self._tables_lower = frozenset(t.lower() for t in self.get_all_tables())
+            self._tables_lower_version = version
+        return self._tables_lower
+    
     def get_table_info(self, table_name: str, include_samples: bool = True) -> TableInfo:
         """
         Get detailed information about a table.
@@ -63,10 +156,29 @@ class SchemaManager:
         """
         logger.debug(f"Fetching info for table: {table_name}")
         
-        # Check cache
-        if table_name in self._schema_cache and not include_samples:
-            logger.debug(f"Returning cached info for table: {table_name}")
-            return self._schema_cache[table_name]
+        # Check cache; samples are only re-read once their TTL has expired
+        cached = self._schema_cache.get(table_name)
+        if cached is not None:
+            if not include_samples:
+                logger.debug(f"Returning cached info for table: {table_name}")
+                return cached
+            
+            fetched_at = self._sample_fetched_at.get(table_name)
+            if fetched_at is not None and time.monotonic() - fetched_at < settings.schema_sample_ttl:
+                logger.debug(f"Returning cached info with samples for table: {table_name}")
+                return cached
+            
+            sample_data = self._get_sample_data(table_name, limit=5)
+            table_info = replace(
+                cached,
+                row_count=self._get_row_count(table_name),
+                sample_data=sample_data,
+                sample_data_rendered=[str(row) for row in sample_data]
+            )
+            self._schema_cache[table_name] = table_info
+            self._sample_fetched_at[table_name] = time.monotonic()
+            logger.debug(f"Refreshed sample data for table: {table_name}")
+            return table_info
         
         # Get column information
         columns = self._get_columns(table_name)
@@ -83,11 +195,14 @@ class SchemaManager:
             name=table_name,
             columns=columns,
             row_count=row_count,
-            sample_data=sample_data
+            sample_data=sample_data,
+            sample_data_rendered=[str(row) for row in sample_data]
         )
         
         # Cache the result
         self._schema_cache[table_name] = table_info
+        if include_samples:
+            self._sample_fetched_at[table_name] = time.monotonic()
         
         logger.info(f"Table '{table_name}': {len(columns)} columns, {row_count} rows")
         return table_info
@@ -126,7 +241,14 @@ class SchemaManager:
         return results
     
     def get_foreign_keys(self, table_name: str) -> List[Dict[str, str]]:
-        """Get foreign key relationships for a table."""
+        """Get foreign key relationships for a table, cached per schema version."""
+        if self._foreign_keys_version != self.schema_version:
+            self._foreign_keys = {}
+            self._foreign_keys_version = self.schema_version
+        cached = self._foreign_keys.get(table_name)
+        if cached is not None:
+            return cached
+        
         query = f"PRAGMA foreign_key_list({table_name})"
         results = self.db.execute_query(query)
         
@@ -141,17 +263,152 @@ class SchemaManager:
             foreign_keys.append(fk)
         
         logger.debug(f"Table '{table_name}' has {len(foreign_keys)} foreign keys")
+        self._foreign_keys[table_name] = foreign_keys
         return foreign_keys
     
+    def get_schema_fingerprint(self) -> str:
+        """
+        Get a stable hash of the database DDL.
+        
+        Changes whenever a table, index or view definition changes, so it can
+        be used to key caches of schema-dependent results. The hash is only
+        recomputed when schema_version moves; the DDL is read after the
+        version, so it is never older than the version it is stored under.
+        """
+        version = self.schema_version
+        if self._fingerprint is not None and self._fingerprint_version == version:
+            return self._fingerprint
+        
+        query = """
+            SELECT type, name, sql FROM sqlite_master
+            WHERE name NOT LIKE 'sqlite_%'
+            ORDER BY type, name
+        """
+        ddl = "\n".join(f"{row['type']}|{row['name']}|{row['sql']}" for row in self.db.execute_query(query))
+        
+        self._fingerprint = hashlib.blake2b(ddl.encode("utf-8"), digest_size=16).hexdigest()
+        self._fingerprint_version = version
+        logger.debug(f"Schema fingerprint: {self._fingerprint}")
+        return self._fingerprint
+    
+    @staticmethod
+    def _read_metadata(conn) -> Tuple[Dict[str, List[ColumnInfo]], Dict[str, List[Dict[str, str]]]]:
+        """
+        Read columns and foreign keys for all tables over an open connection.
+        
+        Returns:
+            Tuple of (columns by table, foreign keys by table); tables are
+            in name order and tables without foreign keys are omitted from
+            the second mapping
+        """
+        columns_by_table: Dict[str, List[ColumnInfo]] = {}
+        for table_name, name, col_type, notnull, default_value, pk in conn.execute(_COLUMNS_QUERY):
+            columns_by_table.setdefault(table_name, []).append(
+                ColumnInfo(
+                    name=name,
+                    type=col_type,
+                    nullable=not bool(notnull),
+                    default_value=default_value,
+                    primary_key=bool(pk)
+                )
+            )
+        
+        fks_by_table: Dict[str, List[Dict[str, str]]] = {}
+        for table_name, column, ref_table, ref_column in conn.execute(_FOREIGN_KEYS_QUERY):
+            fks_by_table.setdefault(table_name, []).append({
+                'column': column,
+                'referenced_table': ref_table,
+                'referenced_column': ref_column
+            })
+        
+        return columns_by_table, fks_by_table
+    
+    def get_all_schema_bulk(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get columns, row counts and foreign keys for every table in one pass.
+        
+        All metadata is read over a single connection inside one read
+        transaction instead of a separate connection per table and PRAGMA.
+        The assembled dict is cached until the schema version changes, and
+        re-read after settings.schema_sample_ttl so row counts stay current.
+        
+        Returns:
+            Mapping of table name to row_count, columns (ColumnInfo) and
+            foreign_keys; directly serializable by orjson
+        """
+        if (
+            self._bulk_schema_cache is not None
+            and self._bulk_schema_version == self.schema_version
+            and time.monotonic() - self._bulk_schema_fetched_at < settings.schema_sample_ttl
+        ):
+            logger.debug("Returning cached bulk schema")
+            return self._bulk_schema_cache
+        
+        logger.info("Fetching bulk database schema")
+        version = self.schema_version
+        schema: Dict[str, Dict[str, Any]] = {}
+        
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                columns_by_table, fks_by_table = self._read_metadata(conn)
+                
+                for table_name, columns in columns_by_table.items():
+                    foreign_keys = fks_by_table.get(table_name, [])
+                    row_count = conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+                    
+                    # Keep entries that already carry sample rows
+                    if table_name not in self._schema_cache:
+                        self._schema_cache[table_name] = TableInfo(
+                            name=table_name,
+                            columns=columns,
+                            row_count=row_count,
+                            sample_data=[]
+                        )
+                    schema[table_name] = {
+                        "row_count": row_count,
+                        "columns": columns,
+                        "foreign_keys": foreign_keys
+                    }
+            finally:
+                conn.rollback()
+        
+        self._bulk_schema_cache = schema
+        self._bulk_schema_version = version
+        self._bulk_schema_fetched_at = time.monotonic()
+        logger.info(f"Bulk schema retrieved for {len(schema)} tables")
+        return schema
+    
     def get_full_schema(self) -> Dict[str, TableInfo]:
         """Get complete schema information for all tables."""
         logger.info("Fetching full database schema")
         
-        tables = self.get_all_tables()
         schema = {}
         
-        for table_name in tables:
-            schema[table_name] = self.get_table_info(table_name, include_samples=True)
+        # One connection and two metadata queries instead of per-table PRAGMAs
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                columns_by_table, _ = self._read_metadata(conn)
+                
+                for table_name, columns in columns_by_table.items():
+                    row_count = conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+                    cursor = conn.execute(f'SELECT * FROM "{table_name}" LIMIT 5')
+                    names = [d[0] for d in cursor.description]
+                    sample_data = [dict(zip(names, row)) for row in cursor]
+                    
+                    table_info = TableInfo(
+                        name=table_name,
+                        columns=columns,
+                        row_count=row_count,
+                        sample_data=sample_data,
+                        sample_data_rendered=[str(row) for row in sample_data]
+                    )
+                    self._schema_cache[table_name] = table_info
+                    self._sample_fetched_at[table_name] = time.monotonic()
+                    schema[table_name] = table_info
+            finally:
+                conn.rollback()
         
         logger.info(f"Full schema retrieved for {len(schema)} tables")
         return schema
@@ -187,7 +444,36 @@ class SchemaManager:
         logger.debug("Schema summary generated")
         return summary
     
+    def get_compact_schema_summary(self) -> str:
+        """
+        Get a token-light schema summary: one line of column names per table.
+        
+        The text only changes with the schema version, so prompts can use it
+        as a stable prefix.
+        """
+        if self._compact_summary is not None and self._compact_summary_version == self.schema_version:
+            return self._compact_summary
+        
+        version = self.schema_version
+        summary_parts = ["Available tables and columns:\n"]
+        for table_name, meta in self.get_all_schema_bulk().items():
+            columns = [col.name for col in meta["columns"]]
+            summary_parts.append(f"- {table_name}: {', '.join(columns)}")
+        
+        self._compact_summary = "\n".join(summary_parts)
+        self._compact_summary_version = version
+        return self._compact_summary
+    
     def clear_cache(self):
-        """Clear the schema cache."""
+        """Clear the schema cache and invalidate dependent caches."""
+        with self._version_lock:
+            self._invalidate()
+        logger.info(f"Schema cache cleared (version {self._version})")
+    
+    def _invalidate(self):
+        """Drop cached table metadata and bump the version; caller holds _version_lock."""
         self._schema_cache.clear()
-        logger.info("Schema cache cleared")
+        self._sample_fetched_at.clear()
+        self._version += 1
+        # Re-read the database's schema version on the next access
+        self._version_checked_at = float("-inf")
@@ -1,12 +1,12 @@
 """Main CLI application for SQL Copilot."""
+import asyncio
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
 from typing import Optional
 import typer
-from rich.console import Console
-from rich.prompt import Prompt
 from rich.panel import Panel
-from rich import print as rprint
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent))
@@ -19,11 +19,9 @@ from utils.formatters import (
     format_results_table, export_to_csv, export_to_json, console
 )
 from database import DatabaseConnection, SchemaManager
-from core import NL2SQLConverter, QueryValidator, QueryExplainer, ErrorCorrector
 
 # Initialize Typer app
 app = typer.Typer(help="SQL Copilot - Natural Language to SQL Assistant")
-console = Console()
 
 # Global logger
 logger = None
@@ -33,6 +31,10 @@ class SQLCopilot:
     """Main SQL Copilot application."""
     
     def __init__(self, use_rag: bool = None):
+        # The core components pull in the LLM and SQL parsing libraries;
+        # importing them here keeps commands like `schema` and `init` fast
+        from core import NL2SQLConverter, QueryValidator, QueryExplainer, ErrorCorrector
+        
         global logger
         logger = setup_logging()
         logger.info("Initializing SQL Copilot")
@@ -43,31 +45,22 @@ class SQLCopilot:
         
         # Initialize components
         try:
-            self.db = DatabaseConnection(settings.database_path)
-            self.schema_manager = SchemaManager(self.db)
-            
-            # Initialize RAG retriever if enabled
-            self.rag_retriever = None
-            if use_rag:
-                try:
-                    from rag.retriever import SchemaRetriever
-                    self.rag_retriever = SchemaRetriever()
-                    if self.rag_retriever.is_indexed():
-                        logger.info("RAG retriever initialized and ready")
-                    else:
-                        logger.warning("RAG retriever initialized but schema not indexed")
-                        logger.warning("Run 'python main.py index-schema' to create embeddings")
-                        self.rag_retriever = None
-                except Exception as e:
-                    logger.warning(f"Failed to initialize RAG retriever: {e}")
-                    logger.warning("Continuing without RAG")
-                    self.rag_retriever = None
+            # Opening the database (and preloading its schema) and opening
+            # the vector store are independent I/O, so they run concurrently
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                schema_future = pool.submit(self._load_schema)
+                rag_future = pool.submit(self._load_retriever) if use_rag else None
+                self.db, self.schema_manager = schema_future.result()
+                self.rag_retriever = rag_future.result() if rag_future else None
             
             self.nl2sql = NL2SQLConverter(self.schema_manager, self.rag_retriever)
             self.validator = QueryValidator(self.schema_manager)
             self.explainer = QueryExplainer()
             self.error_corrector = ErrorCorrector(self.schema_manager)
             
+            # Runs validation while the LLM is still generating the explanation
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            
             logger.info("SQL Copilot initialized successfully")
             print_success("SQL Copilot initialized successfully!")
         
@@ -76,28 +69,101 @@ class SQLCopilot:
             print_error(f"Initialization failed: {e}")
             raise
     
-    def process_query(self, natural_language_query: str, explain: bool = False) -> Optional[list]:
-        """Process a natural language query."""
+    @staticmethod
+    def _load_schema():
+        """Open the database and warm the schema metadata cache."""
+        db = DatabaseConnection(settings.database_path)
+        schema_manager = SchemaManager(db)
+        schema_manager.get_all_schema_bulk()
+        return db, schema_manager
+    
+    @staticmethod
+    def _load_retriever():
+        """Get the RAG retriever, or None if it is unavailable or not indexed."""
+        try:
+            from rag.retriever import get_retriever
+            rag_retriever = get_retriever()
+            if rag_retriever.is_indexed():
+                logger.info("RAG retriever initialized and ready")
+                return rag_retriever
+            logger.warning("RAG retriever initialized but schema not indexed")
+            logger.warning("Run 'python main.py index-schema' to create embeddings")
+        except Exception as e:
+            logger.warning(f"Failed to initialize RAG retriever: {e}")
+            logger.warning("Continuing without RAG")
+        return None
+    
+    def _run_for_display(self, sql_query: str, collect: bool):
+        """
+        Execute a query and build its results table from the streamed rows.
+        
+        Rows go straight from the cursor into the table, which holds at most
+        settings.max_display_rows of them; rows are only kept as
+        dictionaries too when collect is set (e.g. for export).
+        
+        Returns:
+            Tuple of (rich table, list of rows or None, total row count)
+        """
+        rows = chain.from_iterable(self.db.iter_query(sql_query))
+        results = [] if collect else None
+        total = 0
+        
+        def tally(row):
+            nonlocal total
+            total += 1
+            if results is not None:
+                results.append(row)
+            return row
+        
+        table = format_results_table(map(tally, rows), max_rows=settings.max_display_rows)
+        return table, results, total
+    
+    def process_query(
+        self,
+        natural_language_query: str,
+        explain: bool = False,
+        collect: bool = True
+    ) -> Optional[list]:
+        """
+        Process a natural language query.
+        
+        Returns the result rows, or None when collect is False.
+        """
         logger.info(f"Processing query: {natural_language_query}")
         
         try:
             # Convert NL to SQL
             console.print("\n🤖 [bold cyan]Converting to SQL...[/bold cyan]")
-            result = self.nl2sql.convert(natural_language_query)
+            
+            # Show the SQL and start validating it as soon as it is generated
+            early = {}
+            
+            def on_sql(sql: str):
+                print_sql_panel(sql)
+                early['sql'] = sql
+                early['validation'] = self._executor.submit(self.validator.validate, sql)
+            
+            # The async path overlaps RAG retrieval with the cache lookups
+            result = asyncio.run(self.nl2sql.aconvert(natural_language_query, on_sql=on_sql))
             
             sql_query = result['sql']
             explanation = result.get('explanation', '')
             confidence = result.get('confidence', 'medium')
             
-            # Display generated SQL
-            print_sql_panel(sql_query)
+            # Display generated SQL (unless already shown while streaming)
+            if early.get('sql') != sql_query:
+                print_sql_panel(sql_query)
+                early.clear()
             
             if confidence:
                 console.print(f"🎯 Confidence: [bold]{confidence.upper()}[/bold]\n")
             
             # Validate query
             console.print("🔍 [bold yellow]Validating query...[/bold yellow]")
-            is_valid, warnings = self.validator.validate(sql_query)
+            if 'validation' in early:
+                is_valid, warnings = early['validation'].result()
+            else:
+                is_valid, warnings = self.validator.validate(sql_query)
             print_validation_result(is_valid, warnings)
             
             if not is_valid:
@@ -110,14 +176,13 @@ class SQLCopilot:
             
             # Execute query
             console.print("\n⚡ [bold green]Executing query...[/bold green]")
-            results = self.db.execute_query(sql_query)
+            table, results, row_count = self._run_for_display(sql_query, collect)
             
             # Display results
-            if results:
-                table = format_results_table(results)
+            if row_count:
                 console.print("\n")
                 console.print(table)
-                console.print(f"\n📊 [bold]Rows returned:[/bold] {len(results)}")
+                console.print(f"\n📊 [bold]Rows returned:[/bold] {row_count}")
             else:
                 print_info("No results returned")
             
@@ -139,16 +204,17 @@ class SQLCopilot:
                             console.print(f"\n📝 {correction['explanation']}")
                         
                         # Ask if user wants to try the corrected query
+                        from rich.prompt import Prompt
                         retry = Prompt.ask("\nTry the corrected query?", choices=["y", "n"], default="y")
                         if retry.lower() == 'y':
-                            return self.execute_sql(correction['sql'])
+                            return self.execute_sql(correction['sql'], collect)
                 except Exception as correction_error:
                     logger.error(f"Error correction failed: {correction_error}")
             
             return None
     
-    def execute_sql(self, sql_query: str) -> Optional[list]:
-        """Execute a SQL query directly."""
+    def execute_sql(self, sql_query: str, collect: bool = True) -> Optional[list]:
+        """Execute a SQL query directly; returns the rows unless collect is False."""
         logger.info(f"Executing SQL: {sql_query[:100]}...")
         
         try:
@@ -160,13 +226,12 @@ class SQLCopilot:
                 return None
             
             # Execute
-            results = self.db.execute_query(sql_query)
+            table, results, row_count = self._run_for_display(sql_query, collect)
             
             # Display results
-            if results:
-                table = format_results_table(results)
+            if row_count:
                 console.print(table)
-                console.print(f"\n📊 Rows returned: {len(results)}")
+                console.print(f"\n📊 Rows returned: {row_count}")
             else:
                 print_info("No results returned")
             
@@ -205,6 +270,8 @@ class SQLCopilot:
     
     def interactive_mode(self):
         """Start interactive CLI mode."""
+        from rich.prompt import Prompt
+        
         logger.info("Starting interactive mode")
         
         # Display welcome message
@@ -241,7 +308,7 @@ class SQLCopilot:
                 
                 else:
                     # Process as natural language query
-                    self.process_query(user_input, explain=True)
+                    self.process_query(user_input, explain=True, collect=False)
             
             except KeyboardInterrupt:
                 print_info("\nGoodbye! 👋")
@@ -261,7 +328,7 @@ def query(
     """Convert a natural language question to SQL and execute it."""
     try:
         copilot = SQLCopilot()
-        results = copilot.process_query(question, explain=explain)
+        results = copilot.process_query(question, explain=explain, collect=bool(export))
         
         # Export if requested
         if results and export:
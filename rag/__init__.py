@@ -1,5 +1,14 @@
 """RAG package for schema-aware retrieval."""
-from .schema_indexer import SchemaIndexer
-from .retriever import SchemaRetriever
 
-__all__ = ["SchemaIndexer", "SchemaRetriever"]
+__all__ = ["SchemaIndexer", "SchemaRetriever", "get_retriever"]
+
+
+def __getattr__(name):
+    # Submodules pull in chromadb, so they are only imported on first use
+    if name == "SchemaIndexer":
+        from .schema_indexer import SchemaIndexer
+        return SchemaIndexer
+    if name in ("SchemaRetriever", "get_retriever"):
+        from . import retriever
+        return getattr(retriever, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
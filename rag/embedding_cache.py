@@ -0,0 +1,105 @@
+"""Persistent content-addressed cache of document embeddings backed by SQLite."""
+from typing import Dict, List, Optional
+from pathlib import Path
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+from config.settings import settings
+from rag.embeddings import model_id
+from utils.logger import get_logger
+
+logger = get_logger("rag.embedding_cache")
+
+
+class EmbeddingCache:
+    """
+    Stores embeddings keyed by embedding backend/model and a hash of the embedded text.
+
+    Unchanged table descriptions map to the same key, so re-indexing only
+    embeds tables whose description changed. Switching the embedding model
+    misses every entry written under the previous one. Embeddings are
+    stored as float16 to halve the file size.
+    """
+
+    # Bumped when the stored format changes; older rows are discarded
+    _FORMAT_VERSION = 1
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[int] = None):
+        self.path = path or settings.embedding_cache_path
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.embedding_cache_ttl
+        # Backend-qualified, so switching backend or model misses old vectors
+        self.model = model_id()
+        self._lock = threading.Lock()
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                model TEXT,
+                content_hash TEXT,
+                embedding BLOB,
+                created_at INTEGER,
+                expires_at INTEGER,
+                PRIMARY KEY (model, content_hash)
+            )
+        """)
+        # Version 0 stored float32 embeddings
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < self._FORMAT_VERSION:
+            self._conn.execute("DELETE FROM embedding_cache")
+            self._conn.execute(f"PRAGMA user_version = {self._FORMAT_VERSION}")
+        self._conn.commit()
+        logger.info(f"Embedding cache opened at: {self.path}")
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        """Hash the embedded text into a cache key."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, content_hashes: List[str]) -> Dict[str, List[float]]:
+        """Return the unexpired embeddings stored for the given keys."""
+        if not content_hashes:
+            return {}
+
+        placeholders = ", ".join("?" * len(content_hashes))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT content_hash, embedding FROM embedding_cache "
+                f"WHERE model = ? AND content_hash IN ({placeholders}) "
+                "AND (expires_at IS NULL OR expires_at >= ?)",
+                (self.model, *content_hashes, int(time.time()))
+            ).fetchall()
+
+        logger.debug("Embedding cache: %d of %d hits", len(rows), len(content_hashes))
+        return {
+            content_hash: np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+            for content_hash, blob in rows
+        }
+
+    def set_many(self, embeddings: Dict[str, List[float]]):
+        """Store embeddings under their keys with the configured TTL."""
+        now = int(time.time())
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+        rows = [
+            (self.model, content_hash, np.asarray(embedding, dtype=np.float16).tobytes(), now, expires_at)
+            for content_hash, embedding in embeddings.items()
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache "
+                "(model, content_hash, embedding, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Delete all cached embeddings."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embedding_cache")
+            self._conn.commit()
+        logger.info("Embedding cache cleared")
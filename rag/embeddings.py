@@ -0,0 +1,193 @@
+"""Batched text embeddings through Ollama's /api/embed or a TEI server's /embed endpoint."""
+from typing import List, Optional
+import asyncio
+import threading
+import httpx
+import numpy as np
+import orjson
+from config.settings import settings
+from utils.logger import get_logger
+
+logger = get_logger("rag.embeddings")
+
+# Idle connections are kept open between indexing batches and queries
+_LIMITS = httpx.Limits(max_keepalive_connections=40, max_connections=100, keepalive_expiry=30.0)
+# Fail fast when the server is down; model loads can make the first response slow
+_CONNECT_TIMEOUT = 10.0
+
+_client: Optional[httpx.Client] = None
+_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    """
+    Get the shared HTTP client used for embedding requests.
+    
+    Requests go straight to the embedding server's REST API; every
+    embedding request in the process reuses the same pool of keep-alive
+    connections.
+    """
+    global _client
+    
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(**_client_options())
+    
+    return _client
+
+
+def embed_texts(texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+    """
+    Embed texts with the configured embedding model.
+    
+    Texts are sent up to batch_size at a time (default
+    settings.embed_batch_size), one request per batch instead of one per
+    text. Vectors are normalized to unit length, so inner product equals
+    cosine similarity.
+    
+    Args:
+        texts: Texts to embed
+        batch_size: Maximum number of texts per request
+    
+    Returns:
+        One embedding per text, in input order
+    """
+    batch_size = batch_size or settings.embed_batch_size
+    client = get_client()
+    
+    embeddings: List[List[float]] = []
+    for start in range(0, len(texts), batch_size):
+        response = client.post(
+            _endpoint(),
+            content=_request_body(texts[start:start + batch_size]),
+            headers={"Content-Type": "application/json"}
+        )
+        response.raise_for_status()
+        embeddings.extend(_parse_response(response.content))
+    
+    logger.debug("Embedded %d texts (batch size %d)", len(texts), batch_size)
+    return normalize(embeddings)
+
+
+async def aembed_texts(
+    texts: List[str],
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None
+) -> List[List[float]]:
+    """
+    Embed texts like embed_texts, with several batch requests in flight.
+    
+    At most concurrency requests (default settings.embed_concurrency) are
+    outstanding at once, so an Ollama server with OLLAMA_NUM_PARALLEL > 1
+    works on batches side by side. The async client is bound to the
+    running event loop, so one is created per call and shared by its
+    requests.
+    
+    Args:
+        texts: Texts to embed
+        batch_size: Maximum number of texts per request
+        concurrency: Maximum number of concurrent requests
+    
+    Returns:
+        One embedding per text, in input order
+    """
+    batch_size = batch_size or settings.embed_batch_size
+    semaphore = asyncio.Semaphore(concurrency or settings.embed_concurrency)
+    
+    async with httpx.AsyncClient(**_client_options()) as client:
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                response = await client.post(
+                    _endpoint(),
+                    content=_request_body(batch),
+                    headers={"Content-Type": "application/json"}
+                )
+            response.raise_for_status()
+            return _parse_response(response.content)
+        
+        results = await asyncio.gather(*[
+            embed_batch(texts[start:start + batch_size])
+            for start in range(0, len(texts), batch_size)
+        ])
+    
+    embeddings = [embedding for batch in results for embedding in batch]
+    logger.debug("Embedded %d texts (batch size %d, %d requests)", len(texts), batch_size, len(results))
+    return normalize(embeddings)
+
+
+def _client_options() -> dict:
+    """Connection settings shared by the sync and async clients."""
+    return {
+        "base_url": settings.tei_base_url if _backend() == "tei" else settings.ollama_base_url,
+        "timeout": httpx.Timeout(settings.embed_timeout, connect=_CONNECT_TIMEOUT),
+        "limits": _LIMITS,
+    }
+
+
+def _backend() -> str:
+    """Return the configured embedding backend, rejecting unknown names."""
+    backend = settings.embedding_backend
+    if backend not in ("ollama", "tei"):
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    return backend
+
+
+def _endpoint() -> str:
+    return "/embed" if _backend() == "tei" else "/api/embed"
+
+
+def _request_body(texts: List[str]) -> bytes:
+    """Serialize an embedding request for the configured backend and model."""
+    if _backend() == "tei":
+        # TEI serves the model it was started with; overlong inputs are
+        # truncated like Ollama does instead of rejected
+        return orjson.dumps({"inputs": texts, "truncate": True})
+    return orjson.dumps({
+        "model": settings.embedding_model,
+        "input": texts,
+        "keep_alive": settings.ollama_keep_alive,
+    })
+
+
+def _parse_response(content: bytes) -> List[List[float]]:
+    """Extract the embeddings from a backend response body."""
+    payload = orjson.loads(content)
+    # TEI returns the list of vectors itself
+    return payload if _backend() == "tei" else payload["embeddings"]
+
+
+def model_id() -> str:
+    """
+    Identify the source of embeddings for cache keys.
+    
+    A TEI server embeds with whatever model it was started with, so its
+    URL stands in for the model; EMBEDDING_MODEL only names Ollama's.
+    """
+    if _backend() == "tei":
+        return f"tei:{settings.tei_base_url}"
+    return f"ollama:{settings.embedding_model}"
+
+
+def warm_up():
+    """
+    Force the server to load the embedding model with a one-word request.
+    
+    Failures are logged rather than raised so an unavailable server does
+    not prevent startup.
+    """
+    try:
+        embed_texts(["warmup"])
+        logger.info(f"Embedding model warmed up: {settings.embedding_model}")
+    except Exception as e:
+        logger.warning(f"Embedding model warm-up failed: {e}")
+
+
+def normalize(embeddings: List[List[float]]) -> List[List[float]]:
+    """Scale each embedding to unit length; zero vectors are left as-is."""
+    if not embeddings:
+        return []
+    
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms == 0, 1.0, norms)).tolist()
@@ -0,0 +1,119 @@
+"""Persistent cache of query embeddings and retrieved tables backed by SQLite."""
+from typing import List, Optional
+from pathlib import Path
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+import orjson
+from config.settings import settings
+from rag.embeddings import model_id
+from utils.logger import get_logger
+
+logger = get_logger("rag.retrieval_cache")
+
+
+class RetrievalCache:
+    """
+    Stores query embeddings and the tables retrieved for them across restarts.
+
+    Rows are keyed by embedding backend/model and a hash of the normalized query.
+    Cached tables are only reused for the same retrieval parameters, and
+    are cleared whenever the schema is re-indexed. Embeddings are stored
+    as float16, half the size of float32 with ample precision for
+    cosine similarity.
+    """
+
+    # Bumped when the stored format changes; older rows are discarded
+    _FORMAT_VERSION = 1
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.retrieval_cache_path
+        # Backend-qualified, so switching backend or model misses old vectors
+        self.model = model_id()
+        self._lock = threading.Lock()
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS retrieval_cache (
+                model TEXT,
+                query_hash TEXT,
+                embedding BLOB,
+                params TEXT,
+                tables TEXT,
+                created_at INTEGER,
+                PRIMARY KEY (model, query_hash)
+            )
+        """)
+        # Version 0 stored float32 embeddings
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < self._FORMAT_VERSION:
+            self._conn.execute("DELETE FROM retrieval_cache")
+            self._conn.execute(f"PRAGMA user_version = {self._FORMAT_VERSION}")
+        self._conn.commit()
+        logger.info(f"Retrieval cache opened at: {self.path}")
+
+    @staticmethod
+    def make_key(normalized_query: str) -> str:
+        """Hash a normalized query into a cache key."""
+        return hashlib.blake2b(normalized_query.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get_embedding(self, query_hash: str) -> Optional[List[float]]:
+        """Return the stored embedding for a query, or None if missing."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT embedding FROM retrieval_cache WHERE model = ? AND query_hash = ?",
+                (self.model, query_hash)
+            ).fetchone()
+
+        if row is None or row[0] is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float16).astype(np.float32).tolist()
+
+    def get_tables(self, query_hash: str, params: str) -> Optional[List[str]]:
+        """Return the tables retrieved for a query with the same parameters, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tables FROM retrieval_cache WHERE model = ? AND query_hash = ? AND params = ?",
+                (self.model, query_hash, params)
+            ).fetchone()
+
+        if row is None or row[0] is None:
+            return None
+        logger.debug(f"Retrieval cache hit: {query_hash}")
+        return orjson.loads(row[0])
+
+    def set_embedding(self, query_hash: str, embedding: List[float]):
+        """Store the embedding for a query."""
+        blob = np.asarray(embedding, dtype=np.float16).tobytes()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO retrieval_cache (model, query_hash, embedding, created_at) "
+                "VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (model, query_hash) DO UPDATE SET embedding = excluded.embedding",
+                (self.model, query_hash, blob, int(time.time()))
+            )
+            self._conn.commit()
+
+    def set_tables(self, query_hash: str, params: str, tables: List[str]):
+        """Store the tables retrieved for a query with the given parameters."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO retrieval_cache (model, query_hash, params, tables, created_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (model, query_hash) DO UPDATE SET "
+                "params = excluded.params, tables = excluded.tables, created_at = excluded.created_at",
+                (self.model, query_hash, params, orjson.dumps(tables), int(time.time()))
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Delete all cached embeddings and retrieval results."""
+        with self._lock:
+            self._conn.execute("DELETE FROM retrieval_cache")
+            self._conn.commit()
+        logger.info("Retrieval cache cleared")
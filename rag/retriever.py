@@ -1,54 +1,58 @@
 """Schema retriever for finding relevant tables using semantic search."""
-from typing import List, Dict, Any, Optional
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from langchain_community.embeddings import OllamaEmbeddings
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import logging
+import threading
+import numpy as np
+import orjson
 from config.settings import settings
+from rag.embeddings import embed_texts, warm_up
+from rag.retrieval_cache import RetrievalCache
+from rag.vector_store import open_collection
 from utils.logger import get_logger
-import json
 
 logger = get_logger("rag.retriever")
 
+_retriever: Optional["SchemaRetriever"] = None
+_lock = threading.Lock()
+
 
 class SchemaRetriever:
     """Retrieves relevant database tables using semantic search."""
     
+    # Number of query embeddings kept in memory
+    _EMBED_CACHE_SIZE = 128
+    
     def __init__(self):
-        self.chroma_client = None
         self.collection = None
-        self.embeddings = None
+        # Normalized query text -> embedding, least recently used first
+        self._embed_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._embed_lock = threading.Lock()
+        # table name -> (raw related_tables, raw columns, parsed related, parsed columns)
+        self._meta_cache: Dict[str, Tuple[str, str, List[str], List[str]]] = {}
+        # Survives restarts, so repeated CLI invocations skip retrieval
+        self.persistent_cache = RetrievalCache() if settings.retrieval_cache_enabled else None
         self._initialize()
         logger.info("Schema Retriever initialized")
     
     def _initialize(self):
-        """Initialize ChromaDB and embedding model."""
+        """Initialize the vector store."""
         try:
-            # Initialize ChromaDB
-            logger.debug(f"Connecting to ChromaDB at: {settings.vector_db_path}")
-            self.chroma_client = chromadb.PersistentClient(
-                path=settings.vector_db_path,
-                settings=ChromaSettings(
-                    anonymized_telemetry=False
-                )
-            )
-            
             # Get collection
             try:
-                self.collection = self.chroma_client.get_collection(
-                    name="schema_embeddings"
-                )
+                self.collection = open_collection()
                 logger.info(f"Connected to schema embeddings collection. Count: {self.collection.count()}")
             except Exception as e:
                 logger.warning(f"Schema embeddings collection not found: {e}")
                 logger.warning("Run 'python main.py index-schema' to create embeddings")
                 self.collection = None
             
-            # Initialize Ollama embeddings
-            logger.debug(f"Initializing embeddings with model: {settings.embedding_model}")
-            self.embeddings = OllamaEmbeddings(
-                model=settings.embedding_model,
-                base_url=settings.ollama_base_url
-            )
+            logger.debug(f"Embedding model: {settings.embedding_model}")
+            
+            # Load the embedding model while the user is still typing
+            if self.collection is not None and settings.llm_warmup_enabled:
+                threading.Thread(target=warm_up, name="embedding-warmup", daemon=True).start()
             
             logger.info("Schema retriever initialization complete")
         
@@ -73,9 +77,48 @@ class SchemaRetriever:
         Returns:
             List of relevant table names, ordered by relevance
         """
+        logger.info(f"Retrieving relevant tables for query: {query[:100]}...")
+        return self.retrieve_many([query], top_k, similarity_threshold)[0]
+    
+    async def aretrieve(
+        self,
+        query: str,
+        top_k: int = None,
+        similarity_threshold: float = None
+    ) -> List[str]:
+        """
+        Retrieve relevant table names without blocking the event loop.
+        
+        The embedding request and vector search run in a worker thread, so
+        callers can overlap retrieval with other awaits.
+        """
+        return await asyncio.to_thread(self.retrieve, query, top_k, similarity_threshold)
+    
+    def retrieve_many(
+        self,
+        queries: List[str],
+        top_k: int = None,
+        similarity_threshold: float = None
+    ) -> List[List[str]]:
+        """
+        Retrieve relevant table names for several queries at once.
+        
+        All queries are embedded in batched requests and searched with a
+        single ChromaDB query. Repeated questions in the batch are embedded
+        and searched only once, and questions answered by the persistent
+        retrieval cache are not searched at all.
+        
+        Args:
+            queries: Natural language queries
+            top_k: Number of tables to retrieve per query (default from settings)
+            similarity_threshold: Minimum similarity score (default from settings)
+        
+        Returns:
+            One list of relevant table names per query, ordered by relevance
+        """
         if not self.collection:
             logger.warning("No schema embeddings found. Returning empty list.")
-            return []
+            return [[] for _ in queries]
         
         # Use defaults from settings if not provided
         if top_k is None:
@@ -83,49 +126,51 @@ class SchemaRetriever:
         if similarity_threshold is None:
             similarity_threshold = settings.rag_similarity_threshold
         
-        logger.info(f"Retrieving relevant tables for query: {query[:100]}...")
-        logger.debug(f"Parameters: top_k={top_k}, threshold={similarity_threshold}")
+        logger.debug(f"Parameters: queries={len(queries)}, top_k={top_k}, threshold={similarity_threshold}")
         
         try:
-            # Embed the query
-            logger.debug("Generating query embedding")
-            query_embedding = self.embeddings.embed_query(query)
+            # Collapse repeated questions onto their first occurrence
+            index_of: Dict[str, int] = {}
+            unique_queries: List[str] = []
+            positions: List[int] = []
+            for query in queries:
+                key = self._normalize(query)
+                if key not in index_of:
+                    index_of[key] = len(unique_queries)
+                    unique_queries.append(query)
+                positions.append(index_of[key])
             
-            # Search ChromaDB
-            logger.debug("Searching vector database")
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                include=["metadatas", "distances", "documents"]
-            )
+            # Serve what we can from the persistent cache
+            params = f"{top_k}|{similarity_threshold}"
+            all_table_names: List[Optional[List[str]]] = [None] * len(unique_queries)
+            if self.persistent_cache is not None:
+                for u, query in enumerate(unique_queries):
+                    all_table_names[u] = self.persistent_cache.get_tables(
+                        RetrievalCache.make_key(self._normalize(query)), params
+                    )
+            pending = [u for u, tables in enumerate(all_table_names) if tables is None]
+            if not pending:
+                logger.info("Retrieved tables for all queries from the retrieval cache")
+                return [list(all_table_names[p]) for p in positions]
             
-            # Extract table names with scores
-            table_names = []
-            if results and results['ids'] and len(results['ids'][0]) > 0:
-                for i, table_id in enumerate(results['ids'][0]):
-                    distance = results['distances'][0][i]
-                    similarity = 1 - distance  # Convert distance to similarity
-                    
-                    # Apply threshold
-                    if similarity >= similarity_threshold:
-                        metadata = results['metadatas'][0][i]
-                        table_name = metadata['table_name']
-                        table_names.append(table_name)
-                        
-                        logger.debug(
-                            f"Retrieved: {table_name} "
-                            f"(similarity: {similarity:.3f}, "
-                            f"columns: {metadata['column_count']}, "
-                            f"rows: {metadata['row_count']})"
-                        )
+            # Search once for everything the cache could not answer
+            hits = self._search([unique_queries[u] for u in pending], top_k, similarity_threshold)
+            for u, query_hits in zip(pending, hits):
+                table_names = [hit["table_name"] for hit in query_hits]
+                logger.info("Retrieved %d relevant tables: %s", len(table_names), table_names)
+                all_table_names[u] = table_names
+                
+                if self.persistent_cache is not None:
+                    self.persistent_cache.set_tables(
+                        RetrievalCache.make_key(self._normalize(unique_queries[u])), params, table_names
+                    )
             
-            logger.info(f"Retrieved {len(table_names)} relevant tables: {', '.join(table_names)}")
-            return table_names
+            return [list(all_table_names[p]) for p in positions]
         
         except Exception as e:
             logger.error(f"Retrieval failed: {e}")
             logger.warning("Falling back to empty list")
-            return []
+            return [[] for _ in queries]
     
     def retrieve_with_details(
         self, 
@@ -152,44 +197,168 @@ class SchemaRetriever:
         logger.info(f"Retrieving detailed results for: {query[:100]}...")
         
         try:
-            # Embed the query
-            query_embedding = self.embeddings.embed_query(query)
-            
-            # Search
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                include=["metadatas", "distances", "documents"]
-            )
-            
-            # Build detailed results
             detailed_results = []
-            if results and results['ids'] and len(results['ids'][0]) > 0:
-                for i in range(len(results['ids'][0])):
-                    distance = results['distances'][0][i]
-                    similarity = 1 - distance
-                    
-                    if similarity >= similarity_threshold:
-                        metadata = results['metadatas'][0][i]
-                        
-                        detailed_results.append({
-                            "table_name": metadata['table_name'],
-                            "similarity": similarity,
-                            "column_count": metadata['column_count'],
-                            "row_count": metadata['row_count'],
-                            "has_foreign_keys": metadata['has_foreign_keys'],
-                            "related_tables": json.loads(metadata['related_tables']),
-                            "columns": json.loads(metadata['columns']),
-                            "description": results['documents'][0][i]
-                        })
+            for hit in self._search([query], top_k, similarity_threshold, details=True)[0]:
+                metadata = hit["metadata"]
+                related_tables, columns = self._parse_metadata(metadata)
+                
+                detailed_results.append({
+                    "table_name": hit["table_name"],
+                    "similarity": hit["similarity"],
+                    "column_count": metadata['column_count'],
+                    "row_count": metadata['row_count'],
+                    "has_foreign_keys": metadata['has_foreign_keys'],
+                    "related_tables": related_tables,
+                    "columns": columns,
+                    "description": hit["document"]
+                })
             
-            logger.info(f"Retrieved {len(detailed_results)} detailed results")
+            logger.info("Retrieved %d detailed results", len(detailed_results))
             return detailed_results
         
         except Exception as e:
             logger.error(f"Detailed retrieval failed: {e}")
             return []
     
+    def _search(
+        self,
+        queries: List[str],
+        top_k: int,
+        similarity_threshold: float,
+        details: bool = False
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Embed queries and run one vector store query for all of them.
+        
+        Args:
+            queries: Natural language queries
+            top_k: Number of tables to retrieve per query
+            similarity_threshold: Minimum similarity score
+            details: Also fetch each table's description
+        
+        Returns:
+            Per query, the hits above the threshold ordered by relevance, as
+            dicts with table_name, similarity, metadata and document
+        """
+        logger.debug(f"Generating query embeddings ({len(queries)} queries)")
+        query_embeddings = self._embed_many(queries)
+        
+        # Table descriptions are the bulkiest field and only detailed
+        # results read them
+        logger.debug("Searching vector database")
+        include = ["metadatas", "distances"]
+        if details:
+            include.append("documents")
+        results = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=top_k,
+            include=include
+        )
+        
+        # Threshold each query's hits in one array operation
+        debug = logger.isEnabledFor(logging.DEBUG)
+        all_hits = []
+        for q in range(len(queries)):
+            metadatas = results['metadatas'][q]
+            documents = results['documents'][q] if details else None
+            similarities = 1.0 - np.asarray(results['distances'][q])
+            hits = [
+                {
+                    "table_name": metadatas[i]['table_name'],
+                    "similarity": float(similarities[i]),
+                    "metadata": metadatas[i],
+                    "document": documents[i] if documents is not None else None,
+                }
+                for i in np.flatnonzero(similarities >= similarity_threshold)
+            ]
+            
+            # One aggregated line per query; %-style arguments are only
+            # formatted if the record is emitted
+            if debug:
+                logger.debug(
+                    "Retrieved %d tables: %s",
+                    len(hits),
+                    [(hit["table_name"], round(hit["similarity"], 3)) for hit in hits]
+                )
+            all_hits.append(hits)
+        
+        return all_hits
+    
+    def _parse_metadata(self, metadata: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+        """
+        Decode a hit's JSON-encoded related_tables and columns.
+        
+        Parsed lists are cached per table and reused while the stored JSON
+        is unchanged, so a re-index is picked up without explicit
+        invalidation.
+        """
+        raw_related = metadata['related_tables']
+        raw_columns = metadata['columns']
+        cached = self._meta_cache.get(metadata['table_name'])
+        if cached is None or cached[0] != raw_related or cached[1] != raw_columns:
+            cached = (raw_related, raw_columns, orjson.loads(raw_related), orjson.loads(raw_columns))
+            self._meta_cache[metadata['table_name']] = cached
+        
+        # Copies, so callers cannot mutate the cached lists
+        return list(cached[2]), list(cached[3])
+    
+    @staticmethod
+    def _normalize(query: str) -> str:
+        """Normalize a query for cache and de-duplication lookups."""
+        return query.strip().lower()
+    
+    def _embed(self, query: str) -> List[float]:
+        """Embed a single query, reusing a cached embedding when available."""
+        return self._embed_many([query])[0]
+    
+    def _embed_many(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed queries, sending only the ones not already cached to Ollama.
+        
+        Queries are cached by their stripped, lowercased text, so repeated
+        questions in a session skip the embedding round-trip. Misses fall
+        back to the persistent retrieval cache before calling Ollama.
+        """
+        keys = [self._normalize(query) for query in queries]
+        embeddings: List[Optional[List[float]]] = [None] * len(keys)
+        
+        with self._embed_lock:
+            for i, key in enumerate(keys):
+                cached = self._embed_cache.get(key)
+                if cached is not None:
+                    self._embed_cache.move_to_end(key)
+                    embeddings[i] = cached
+        
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not misses:
+            logger.debug(f"Query embedding cache: {len(keys)} hits")
+            return embeddings
+        
+        if self.persistent_cache is not None:
+            for i in misses:
+                embeddings[i] = self.persistent_cache.get_embedding(RetrievalCache.make_key(keys[i]))
+        remaining = [i for i in misses if embeddings[i] is None]
+        logger.debug(
+            f"Query embedding cache: {len(keys) - len(misses)} hits, "
+            f"{len(misses) - len(remaining)} persistent hits, {len(remaining)} misses"
+        )
+        
+        if remaining:
+            fresh = embed_texts([queries[i] for i in remaining])
+            for i, embedding in zip(remaining, fresh):
+                embeddings[i] = embedding
+                if self.persistent_cache is not None:
+                    self.persistent_cache.set_embedding(RetrievalCache.make_key(keys[i]), embedding)
+        
+        with self._embed_lock:
+            for i in misses:
+                self._embed_cache[keys[i]] = embeddings[i]
+                self._embed_cache.move_to_end(keys[i])
+            while len(self._embed_cache) > self._EMBED_CACHE_SIZE:
+                self._embed_cache.popitem(last=False)
+        
+        return embeddings
+    
     def is_indexed(self) -> bool:
         """Check if schema embeddings exist."""
         if not self.collection:
@@ -206,3 +375,21 @@ class SchemaRetriever:
             "count": self.collection.count(),
             "collection_name": self.collection.name
         }
+
+
+def get_retriever() -> SchemaRetriever:
+    """
+    Get the shared schema retriever for this process.
+    
+    The ChromaDB client and its loaded index are reused across callers. A
+    retriever created before the schema was indexed is rebuilt on the next
+    call so it picks up the new collection.
+    """
+    global _retriever
+    
+    if _retriever is None or _retriever.collection is None:
+        with _lock:
+            if _retriever is None or _retriever.collection is None:
+                _retriever = SchemaRetriever()
+    
+    return _retriever
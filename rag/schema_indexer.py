@@ -1,54 +1,54 @@
 """Schema indexer for creating and maintaining vector embeddings of database schema."""
-from typing import List, Dict, Any
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from langchain_community.embeddings import OllamaEmbeddings
+from typing import List, Dict, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import io
+import re
 from database.schema_manager import SchemaManager
+from rag.embedding_cache import EmbeddingCache
+from rag.embeddings import aembed_texts
+from rag.retrieval_cache import RetrievalCache
+from rag.vector_store import open_collection
 from config.settings import settings
 from utils.logger import get_logger
-import json
+import orjson
 
 logger = get_logger("rag.schema_indexer")
 
+# Table name keyword -> use cases, in description order
+_NAME_USE_CASES = (
+    ("customer", ("Customer information and demographics", "Customer contact details")),
+    ("order", ("Order history and transactions", "Sales and revenue analysis")),
+    ("product", ("Product catalog and inventory", "Product pricing and details")),
+    ("review", ("Customer feedback and ratings", "Product quality analysis")),
+    ("category", ("Product categorization", "Hierarchical organization")),
+)
+_NAME_TRIGGER_RE = re.compile("|".join(trigger for trigger, _ in _NAME_USE_CASES))
+_PRICING_COLUMNS = frozenset({"price", "amount"})
+
 
 class SchemaIndexer:
     """Creates and maintains vector embeddings for database schema."""
     
+    # Entries per upsert; each ChromaDB upsert is one SQLite transaction
+    _UPSERT_BATCH_SIZE = 250
+    
     def __init__(self, schema_manager: SchemaManager):
         self.schema_manager = schema_manager
-        self.chroma_client = None
+        self.include_samples = settings.index_include_samples
         self.collection = None
-        self.embeddings = None
         self._initialize()
         logger.info("Schema Indexer initialized")
     
     def _initialize(self):
-        """Initialize ChromaDB and embedding model."""
+        """Initialize the vector store."""
         try:
-            # Initialize ChromaDB
-            logger.info(f"Initializing ChromaDB at: {settings.vector_db_path}")
-            self.chroma_client = chromadb.PersistentClient(
-                path=settings.vector_db_path,
-                settings=ChromaSettings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
-                )
-            )
-            
             # Get or create collection
-            self.collection = self.chroma_client.get_or_create_collection(
-                name="schema_embeddings",
-                metadata={"description": "Database schema embeddings for RAG"}
-            )
-            
-            logger.info(f"ChromaDB collection ready. Current count: {self.collection.count()}")
+            logger.info(f"Initializing {settings.vector_store} vector store at: {settings.vector_db_path}")
+            self.collection = open_collection(create=True)
             
-            # Initialize Ollama embeddings
-            logger.info(f"Initializing Ollama embeddings with model: {settings.embedding_model}")
-            self.embeddings = OllamaEmbeddings(
-                model=settings.embedding_model,
-                base_url=settings.ollama_base_url
-            )
+            logger.info(f"Vector store collection ready. Current count: {self.collection.count()}")
+            logger.info(f"Embedding model: {settings.embedding_model}")
             
             logger.info("Schema indexer initialization complete")
         
@@ -67,21 +67,46 @@ class SchemaIndexer:
         
         try:
             # Clear existing if force reindex
-            if force_reindex and self.collection.count() > 0:
-                logger.info("Force reindex: clearing existing embeddings")
-                self.chroma_client.delete_collection("schema_embeddings")
-                self.collection = self.chroma_client.create_collection(
-                    name="schema_embeddings",
-                    metadata={"description": "Database schema embeddings for RAG"}
-                )
+            # A collection built with another distance metric is recreated so
+            # it picks up the inner-product space; otherwise entries are
+            # deleted in place and the open collection is kept
+            if force_reindex:
+                if (self.collection.metadata or {}).get("hnsw:space") != "ip":
+                    logger.info("Force reindex: recreating collection with inner-product space")
+                    self.collection = open_collection(reset=True)
+                elif self.collection.count() > 0:
+                    logger.info("Force reindex: clearing existing embeddings")
+                    existing = self.collection.get(include=[])['ids']
+                    if existing:
+                        self.collection.delete(ids=existing)
+            
+            # Describe the schema as it is now, not as it was first cached
+            self.schema_manager.clear_cache()
             
             # Get all tables
             tables = self.schema_manager.get_all_tables()
             logger.info(f"Indexing {len(tables)} tables")
             
-            # Index each table
-            for table_name in tables:
-                self._index_table(table_name)
+            # Describe every table, then embed them in batched requests and
+            # store them with a single upsert. Table metadata is read on
+            # several pooled connections at once.
+            ids, descriptions, metadatas = [], [], []
+            if tables:
+                with ThreadPoolExecutor(max_workers=min(settings.db_pool_size, len(tables))) as executor:
+                    for entry_id, description, metadata in executor.map(self._prepare_table, tables):
+                        ids.append(entry_id)
+                        descriptions.append(description)
+                        metadatas.append(metadata)
+            
+            if ids:
+                embeddings = self._embed_descriptions(descriptions)
+                for start in range(0, len(ids), self._UPSERT_BATCH_SIZE):
+                    end = start + self._UPSERT_BATCH_SIZE
+                    self._upsert(ids[start:end], embeddings[start:end], descriptions[start:end], metadatas[start:end])
+            
+            # Cached retrieval results refer to the previous index
+            if settings.retrieval_cache_enabled:
+                RetrievalCache().clear()
             
             logger.info(f"Schema indexing complete. Total embeddings: {self.collection.count()}")
         
@@ -89,128 +114,130 @@ class SchemaIndexer:
             logger.error(f"Schema indexing failed: {e}")
             raise
     
-    def _index_table(self, table_name: str):
-        """Index a single table."""
-        logger.debug(f"Indexing table: {table_name}")
+    def _upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """Upsert one batch of entries, retrying it once on failure."""
+        try:
+            self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        except Exception as e:
+            # Upserts are idempotent, so the whole batch can simply be resent
+            logger.warning(f"Upsert of {len(ids)} entries failed, retrying: {e}")
+            self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        logger.debug("Upserted %d entries", len(ids))
+    
+    def _embed_descriptions(self, descriptions: List[str]) -> List[List[float]]:
+        """Embed table descriptions, reusing cached vectors for unchanged ones."""
+        if not settings.embedding_cache_enabled:
+            logger.debug("Generating embeddings for %d tables", len(descriptions))
+            return asyncio.run(aembed_texts(descriptions))
         
+        cache = EmbeddingCache()
+        keys = [EmbeddingCache.make_key(description) for description in descriptions]
+        cached = cache.get_many(keys)
+        
+        misses = [i for i, key in enumerate(keys) if key not in cached]
+        logger.info(f"Embedding {len(misses)} changed tables ({len(keys) - len(misses)} unchanged)")
+        if misses:
+            fresh = asyncio.run(aembed_texts([descriptions[i] for i in misses]))
+            cache.set_many({keys[i]: embedding for i, embedding in zip(misses, fresh)})
+            for i, embedding in zip(misses, fresh):
+                cached[keys[i]] = embedding
+        
+        return [cached[key] for key in keys]
+    
+    def _prepare_table(self, table_name: str) -> Tuple[str, str, Dict[str, Any]]:
+        """Build a table's vector store id, description and metadata."""
         try:
             # Get table info
-            table_info = self.schema_manager.get_table_info(table_name, include_samples=True)
-            
-            # Create rich text description
-            description = self._create_table_description(table_info)
+            table_info = self.schema_manager.get_table_info(table_name, include_samples=self.include_samples)
             
             # Get foreign keys
             foreign_keys = self.schema_manager.get_foreign_keys(table_name)
             
+            # Create rich text description
+            description = self._create_table_description(table_info, foreign_keys)
+            
             # Create metadata
             metadata = {
                 "table_name": table_name,
                 "column_count": len(table_info.columns),
                 "row_count": table_info.row_count,
                 "has_foreign_keys": len(foreign_keys) > 0,
-                "related_tables": json.dumps([fk['referenced_table'] for fk in foreign_keys]),
-                "columns": json.dumps([col.name for col in table_info.columns])
+                "related_tables": orjson.dumps([fk['referenced_table'] for fk in foreign_keys]).decode(),
+                "columns": orjson.dumps([col.name for col in table_info.columns]).decode()
             }
             
-            # Generate embedding
-            logger.debug(f"Generating embedding for table: {table_name}")
-            embedding = self.embeddings.embed_query(description)
-            
-            # Store in ChromaDB
-            self.collection.upsert(
-                ids=[f"table_{table_name}"],
-                embeddings=[embedding],
-                documents=[description],
-                metadatas=[metadata]
-            )
-            
-            logger.debug(f"Successfully indexed table: {table_name}")
+            return f"table_{table_name}", description, metadata
         
         except Exception as e:
-            logger.error(f"Failed to index table {table_name}: {e}")
+            logger.error(f"Failed to prepare table {table_name}: {e}")
             raise
     
-    def _create_table_description(self, table_info) -> str:
+    def _create_table_description(self, table_info, foreign_keys: List[Dict[str, str]]) -> str:
         """Create a rich text description of a table for embedding."""
-        
-        description_parts = []
+        buf = io.StringIO()
         
         # Table name and basic info
-        description_parts.append(f"Table Name: {table_info.name}")
-        description_parts.append(f"Row Count: {table_info.row_count} rows")
+        buf.write(f"Table Name: {table_info.name}\nRow Count: {table_info.row_count} rows\n")
         
         # Columns with types
-        description_parts.append("\nColumns:")
-        for col in table_info.columns:
-            col_desc = f"- {col.name} ({col.type})"
-            if col.primary_key:
-                col_desc += " [PRIMARY KEY]"
-            if not col.nullable:
-                col_desc += " [NOT NULL]"
-            description_parts.append(col_desc)
-        
-        # Sample data (first 2 rows)
-        if table_info.sample_data:
-            description_parts.append("\nSample Data:")
+        buf.write("\nColumns:\n")
+        buf.write("\n".join(
+            f"- {col.name} ({col.type})"
+            f"{' [PRIMARY KEY]' if col.primary_key else ''}{'' if col.nullable else ' [NOT NULL]'}"
+            for col in table_info.columns
+        ))
+        
+        # Sample data (first 2 rows); cached table info may carry samples
+        # even when they were not requested
+        if self.include_samples and table_info.sample_data:
+            buf.write("\n\nSample Data:")
+            # Sample rows are already plain dicts
             for i, row in enumerate(table_info.sample_data[:2], 1):
-                # Convert row to readable format
-                row_data = {k: v for k, v in dict(row).items()}
-                description_parts.append(f"Row {i}: {json.dumps(row_data)}")
+                buf.write(f"\nRow {i}: {orjson.dumps(row, default=str).decode()}")
         
         # Foreign keys
-        foreign_keys = self.schema_manager.get_foreign_keys(table_info.name)
         if foreign_keys:
-            description_parts.append("\nRelationships:")
+            buf.write("\n\nRelationships:")
             for fk in foreign_keys:
-                description_parts.append(
-                    f"- {fk['column']} references {fk['referenced_table']}.{fk['referenced_column']}"
-                )
+                buf.write(f"\n- {fk['column']} references {fk['referenced_table']}.{fk['referenced_column']}")
         
         # Common use cases (inferred from table name and columns)
         use_cases = self._infer_use_cases(table_info)
         if use_cases:
-            description_parts.append("\nCommon Use Cases:")
+            buf.write("\n\nCommon Use Cases:")
             for use_case in use_cases:
-                description_parts.append(f"- {use_case}")
+                buf.write(f"\n- {use_case}")
         
-        description = "\n".join(description_parts)
-        logger.debug(f"Created description for {table_info.name}: {len(description)} chars")
+        description = buf.getvalue()
+        # Formatted only if DEBUG is enabled; this runs once per table
+        logger.debug("Created description for %s: %d chars", table_info.name, len(description))
         
         return description
     
     def _infer_use_cases(self, table_info) -> List[str]:
         """Infer common use cases based on table name and columns."""
         use_cases = []
-        table_name = table_info.name.lower()
-        column_names = [col.name.lower() for col in table_info.columns]
-        
-        # Common patterns
-        if 'customer' in table_name:
-            use_cases.append("Customer information and demographics")
-            use_cases.append("Customer contact details")
-        
-        if 'order' in table_name:
-            use_cases.append("Order history and transactions")
-            use_cases.append("Sales and revenue analysis")
-        
-        if 'product' in table_name:
-            use_cases.append("Product catalog and inventory")
-            use_cases.append("Product pricing and details")
-        
-        if 'review' in table_name or 'rating' in column_names:
-            use_cases.append("Customer feedback and ratings")
-            use_cases.append("Product quality analysis")
+        column_names = frozenset(col.name.lower() for col in table_info.columns)
         
-        if 'category' in table_name:
-            use_cases.append("Product categorization")
-            use_cases.append("Hierarchical organization")
+        # Common patterns, matched against the table name in one scan
+        found = set(_NAME_TRIGGER_RE.findall(table_info.name.lower()))
+        if "rating" in column_names:
+            found.add("review")
+        for trigger, cases in _NAME_USE_CASES:
+            if trigger in found:
+                use_cases.extend(cases)
         
         # Check for common columns
-        if 'price' in column_names or 'amount' in column_names:
+        if not column_names.isdisjoint(_PRICING_COLUMNS):
             use_cases.append("Financial and pricing data")
         
-        if 'date' in str(column_names) or 'created_at' in column_names:
+        if "created_at" in column_names or any("date" in name for name in column_names):
             use_cases.append("Time-based analysis and trends")
         
         return use_cases
@@ -226,9 +253,5 @@ class SchemaIndexer:
     def clear_index(self):
         """Clear all embeddings."""
         logger.warning("Clearing all schema embeddings")
-        self.chroma_client.delete_collection("schema_embeddings")
-        self.collection = self.chroma_client.create_collection(
-            name="schema_embeddings",
-            metadata={"description": "Database schema embeddings for RAG"}
-        )
+        self.collection = open_collection(reset=True)
         logger.info("Schema index cleared")
@@ -0,0 +1,312 @@
+"""Vector store backends holding the schema embeddings collection."""
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+import threading
+import numpy as np
+import orjson
+from config.settings import settings
+from utils.logger import get_logger
+
+logger = get_logger("rag.vector_store")
+
+COLLECTION_NAME = "schema_embeddings"
+
+# Embeddings are unit length, so inner-product distance ranks like cosine
+# without normalizing at query time
+COLLECTION_METADATA = {
+    "description": "Database schema embeddings for RAG",
+    "hnsw:space": "ip",
+}
+
+_chroma_client = None
+_lock = threading.Lock()
+
+
+def get_chroma_client():
+    """Get the shared ChromaDB client for settings.vector_db_path."""
+    global _chroma_client
+
+    if _chroma_client is None:
+        with _lock:
+            if _chroma_client is None:
+                # Imported here so loading this module stays cheap
+                import chromadb
+                from chromadb.config import Settings as ChromaSettings
+
+                logger.debug(f"Connecting to ChromaDB at: {settings.vector_db_path}")
+                _chroma_client = chromadb.PersistentClient(
+                    path=settings.vector_db_path,
+                    settings=ChromaSettings(
+                        anonymized_telemetry=False,
+                        allow_reset=True
+                    )
+                )
+
+    return _chroma_client
+
+
+def open_collection(create: bool = False, reset: bool = False):
+    """
+    Open the schema embeddings collection in the configured vector store.
+
+    Args:
+        create: Create the collection if it does not exist
+        reset: Discard any existing collection and start empty
+
+    Returns:
+        A ChromaDB collection, or an object exposing the same count, query
+        and upsert methods
+
+    Raises:
+        Exception: If the collection does not exist and create/reset is False
+    """
+    backend = settings.vector_store
+    logger.debug(f"Opening {backend} vector store")
+
+    if backend == "faiss":
+        return FaissCollection.open(Path(settings.vector_db_path), create=create, reset=reset)
+    if backend == "hnswlib":
+        return HnswlibCollection.open(Path(settings.vector_db_path), create=create, reset=reset)
+    if backend != "chroma":
+        raise ValueError(f"Unknown vector store: {backend}")
+
+    client = get_chroma_client()
+    if reset:
+        client.delete_collection(COLLECTION_NAME)
+        return client.create_collection(name=COLLECTION_NAME, metadata=COLLECTION_METADATA)
+    if create:
+        return client.get_or_create_collection(name=COLLECTION_NAME, metadata=COLLECTION_METADATA)
+    return client.get_collection(name=COLLECTION_NAME)
+
+
+class _FileCollection:
+    """
+    Schema embeddings in an in-process ANN index persisted to disk.
+
+    Mirrors the parts of the ChromaDB collection API used by the indexer
+    and retriever (count, get, query, upsert and delete). The index file sits next to a JSON sidecar holding ids,
+    documents and metadata; distances are reported as ``1 - inner
+    product`` like ChromaDB's ip space. Subclasses supply the index.
+    """
+
+    _EXTENSION = ""
+
+    def __init__(self, directory: Path):
+        self.name = COLLECTION_NAME
+        self.metadata = COLLECTION_METADATA
+        self._index_path = directory / f"{COLLECTION_NAME}{self._EXTENSION}"
+        self._sidecar_path = directory / f"{COLLECTION_NAME}{self._EXTENSION}.json"
+        self._index = None
+        self._dim: Optional[int] = None
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+
+    @classmethod
+    def open(cls, directory: Path, create: bool = False, reset: bool = False) -> "_FileCollection":
+        """Load the persisted index, or start an empty one if allowed."""
+        collection = cls(directory)
+
+        if reset:
+            collection._index_path.unlink(missing_ok=True)
+            collection._sidecar_path.unlink(missing_ok=True)
+        elif collection._index_path.exists():
+            collection._load()
+        elif not create:
+            raise FileNotFoundError(f"Vector index not found: {collection._index_path}")
+
+        return collection
+
+    def _load(self):
+        sidecar = orjson.loads(self._sidecar_path.read_bytes())
+        self._dim = sidecar["dim"]
+        self._ids = sidecar["ids"]
+        self._documents = sidecar["documents"]
+        self._metadatas = sidecar["metadatas"]
+        self._index = self._read_index()
+        logger.info(f"{type(self).__name__} loaded: {len(self._ids)} vectors")
+
+    def _save(self):
+        self._index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_index()
+        self._sidecar_path.write_bytes(orjson.dumps({
+            "dim": self._dim,
+            "ids": self._ids,
+            "documents": self._documents,
+            "metadatas": self._metadatas,
+        }))
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def get(self, include: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+        """Return every entry; results are shaped like ChromaDB's get output."""
+        include = ["metadatas", "documents"] if include is None else include
+        return {
+            "ids": list(self._ids),
+            "metadatas": list(self._metadatas) if "metadatas" in include else None,
+            "documents": list(self._documents) if "documents" in include else None,
+        }
+
+    def delete(self, ids: List[str]):
+        """Remove entries by id, then rebuild and persist the index."""
+        removed = set(ids)
+        keep = [i for i, entry_id in enumerate(self._ids) if entry_id not in removed]
+        if len(keep) == len(self._ids):
+            return
+
+        vectors = np.asarray(self._vectors(), dtype=np.float32)[keep]
+        self._ids = [self._ids[i] for i in keep]
+        self._documents = [self._documents[i] for i in keep]
+        self._metadatas = [self._metadatas[i] for i in keep]
+
+        if not keep:
+            self._index = None
+            self._index_path.unlink(missing_ok=True)
+            self._sidecar_path.unlink(missing_ok=True)
+            return
+
+        self._index = self._build(vectors)
+        self._save()
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """Insert or replace entries, then rebuild and persist the index."""
+        # HNSW graphs cannot delete vectors, so the (small) index is rebuilt
+        vectors = list(self._vectors()) if self._index is not None else []
+        position = {entry_id: i for i, entry_id in enumerate(self._ids)}
+
+        for entry_id, embedding, document, metadata in zip(ids, embeddings, documents, metadatas):
+            i = position.get(entry_id)
+            if i is None:
+                position[entry_id] = len(self._ids)
+                self._ids.append(entry_id)
+                self._documents.append(document)
+                self._metadatas.append(metadata)
+                vectors.append(np.asarray(embedding, dtype=np.float32))
+            else:
+                self._documents[i] = document
+                self._metadatas[i] = metadata
+                vectors[i] = np.asarray(embedding, dtype=np.float32)
+
+        matrix = np.vstack(vectors).astype(np.float32)
+        self._dim = matrix.shape[1]
+        self._index = self._build(matrix)
+        self._save()
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, List[List[Any]]]:
+        """Search the index; results are shaped like ChromaDB's query output."""
+        include = include or ["metadatas", "distances", "documents"]
+        results: Dict[str, List[List[Any]]] = {"ids": [], "distances": [], "metadatas": [], "documents": []}
+        if self._index is None or not self._ids:
+            for key in results:
+                results[key] = [[] for _ in query_embeddings]
+            return results
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        distances, labels = self._search(queries, min(n_results, len(self._ids)))
+
+        for row_distances, row_labels in zip(distances, labels):
+            # Unfilled slots come back as -1
+            found = row_labels >= 0
+            hits = row_labels[found].tolist()
+            results["ids"].append([self._ids[i] for i in hits])
+            results["distances"].append(row_distances[found].tolist())
+            results["metadatas"].append([self._metadatas[i] for i in hits] if "metadatas" in include else None)
+            results["documents"].append([self._documents[i] for i in hits] if "documents" in include else None)
+
+        return results
+
+
+class FaissCollection(_FileCollection):
+    """
+    Schema embeddings in a FAISS HNSW index using inner product.
+
+    Vectors are stored with a float16 scalar quantizer, halving index
+    memory; unit-length embeddings lose well under 1e-3 of similarity.
+    """
+
+    _EXTENSION = ".faiss"
+    # HNSW graph degree and search breadth
+    _HNSW_M = 32
+    _EF_SEARCH = 64
+
+    def _read_index(self):
+        import faiss
+
+        index = faiss.read_index(str(self._index_path))
+        index.hnsw.efSearch = self._EF_SEARCH
+        return index
+
+    def _write_index(self):
+        import faiss
+
+        faiss.write_index(self._index, str(self._index_path))
+
+    def _vectors(self) -> np.ndarray:
+        return self._index.reconstruct_n(0, self._index.ntotal)
+
+    def _build(self, vectors: np.ndarray):
+        import faiss
+
+        index = faiss.IndexHNSWSQ(
+            vectors.shape[1], faiss.ScalarQuantizer.QT_fp16, self._HNSW_M, faiss.METRIC_INNER_PRODUCT
+        )
+        index.hnsw.efSearch = self._EF_SEARCH
+        # fp16 quantization has no parameters to learn; train is a formality
+        index.train(vectors)
+        index.add(vectors)
+        return index
+
+    def _search(self, queries: np.ndarray, k: int):
+        scores, labels = self._index.search(queries, k)
+        return 1.0 - scores, labels
+
+
+class HnswlibCollection(_FileCollection):
+    """Schema embeddings in an hnswlib index using inner product."""
+
+    _EXTENSION = ".hnsw"
+    # HNSW graph degree, build breadth and minimum search breadth
+    _HNSW_M = 16
+    _EF_CONSTRUCTION = 200
+    _EF_SEARCH = 64
+
+    def _read_index(self):
+        import hnswlib
+
+        index = hnswlib.Index(space="ip", dim=self._dim)
+        index.load_index(str(self._index_path), max_elements=len(self._ids))
+        index.set_ef(self._EF_SEARCH)
+        return index
+
+    def _write_index(self):
+        self._index.save_index(str(self._index_path))
+
+    def _vectors(self) -> np.ndarray:
+        return np.asarray(self._index.get_items(list(range(len(self._ids)))), dtype=np.float32)
+
+    def _build(self, vectors: np.ndarray):
+        import hnswlib
+
+        index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+        index.init_index(max_elements=len(vectors), ef_construction=self._EF_CONSTRUCTION, M=self._HNSW_M)
+        index.add_items(vectors, np.arange(len(vectors)))
+        index.set_ef(self._EF_SEARCH)
+        return index
+
+    def _search(self, queries: np.ndarray, k: int):
+        # hnswlib needs a search breadth of at least k
+        self._index.set_ef(max(self._EF_SEARCH, k))
+        labels, distances = self._index.knn_query(queries, k=k)
+        return distances, labels.astype(np.int64)
@@ -3,12 +3,15 @@ import sqlite3
 import random
 from datetime import datetime, timedelta
 from pathlib import Path
+import numpy as np
 from faker import Faker
 
 # Initialize Faker for generating realistic data
 fake = Faker()
 Faker.seed(42)  # For reproducibility
 random.seed(42)
+# Numeric columns are drawn in bulk
+rng = np.random.default_rng(42)
 
 
 def create_database(db_path: str = "data/ecommerce.db"):
@@ -26,6 +29,14 @@ def create_database(db_path: str = "data/ecommerce.db"):
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
+    # A throwaway seed database does not need durability; skip journaling
+    # and fsyncs and build everything in one transaction
+    cursor.executescript(
+        "PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF; "
+        "PRAGMA temp_store=MEMORY; PRAGMA locking_mode=EXCLUSIVE;"
+    )
+    cursor.execute("BEGIN")
+    
     print(f"Creating database: {db_path}")
     
     # Create tables
@@ -51,8 +62,10 @@ def create_database(db_path: str = "data/ecommerce.db"):
     insert_reviews(cursor, num_reviews=150)
     print("✓ Reviews inserted")
     
-    # Commit and close
+    # Commit and close; the cursor is closed first so its last statement
+    # does not hold the exclusive lock past conn.close()
     conn.commit()
+    cursor.close()
     conn.close()
     
     print(f"\n✅ Database created successfully: {db_path}")
@@ -171,18 +184,16 @@ def insert_products(cursor, num_products=100):
         8: ["Shampoo", "Soap", "Lotion", "Vitamins", "Makeup", "Perfume"],
     }
     
-    products = []
-    for _ in range(num_products):
-        category_id = random.randint(1, 8)
-        product_type = random.choice(product_templates[category_id])
-        brand = fake.company()
-        
-        name = f"{brand} {product_type}"
-        price = round(random.uniform(9.99, 999.99), 2)
-        stock = random.randint(0, 200)
-        description = fake.sentence(nb_words=10)
-        
-        products.append((name, category_id, price, stock, description))
+    category_ids = rng.integers(1, 9, num_products).tolist()
+    prices = rng.uniform(9.99, 999.99, num_products).round(2).tolist()
+    stocks = rng.integers(0, 201, num_products).tolist()
+    names = [
+        f"{fake.company()} {random.choice(product_templates[category_id])}"
+        for category_id in category_ids
+    ]
+    descriptions = [fake.sentence(nb_words=10) for _ in range(num_products)]
+    
+    products = list(zip(names, category_ids, prices, stocks, descriptions))
     
     cursor.executemany(
         "INSERT INTO products (name, category_id, price, stock, description) VALUES (?, ?, ?, ?, ?)",
@@ -192,15 +203,7 @@ def insert_products(cursor, num_products=100):
 
 def insert_customers(cursor, num_customers=50):
     """Insert sample customers."""
-    customers = []
-    
-    for _ in range(num_customers):
-        name = fake.name()
-        email = fake.email()
-        country = fake.country()
-        city = fake.city()
-        
-        customers.append((name, email, country, city))
+    customers = [(fake.name(), fake.email(), fake.country(), fake.city()) for _ in range(num_customers)]
     
     cursor.executemany(
         "INSERT INTO customers (name, email, country, city) VALUES (?, ?, ?, ?)",
@@ -211,15 +214,13 @@ def insert_customers(cursor, num_customers=50):
 def insert_orders(cursor, num_orders=200):
     """Insert sample orders."""
     statuses = ["pending", "processing", "shipped", "delivered", "cancelled"]
-    orders = []
     
-    for _ in range(num_orders):
-        customer_id = random.randint(1, 50)
-        order_date = fake.date_time_between(start_date="-1y", end_date="now")
-        total_amount = round(random.uniform(20.0, 2000.0), 2)
-        status = random.choice(statuses)
-        
-        orders.append((customer_id, order_date, total_amount, status))
+    customer_ids = rng.integers(1, 51, num_orders).tolist()
+    order_dates = [fake.date_time_between(start_date="-1y", end_date="now") for _ in range(num_orders)]
+    total_amounts = rng.uniform(20.0, 2000.0, num_orders).round(2).tolist()
+    order_statuses = rng.choice(statuses, num_orders).tolist()
+    
+    orders = list(zip(customer_ids, order_dates, total_amounts, order_statuses))
     
     cursor.executemany(
         "INSERT INTO orders (customer_id, order_date, total_amount, status) VALUES (?, ?, ?, ?)",
@@ -231,6 +232,9 @@ def insert_order_items(cursor):
     """Insert order items for each order."""
     order_items = []
     
+    # Look up every product price once instead of per item
+    prices = dict(cursor.execute("SELECT id, price FROM products").fetchall())
+    
     for order_id in range(1, 201):
         num_items = random.randint(1, 5)
         
@@ -238,9 +242,7 @@ def insert_order_items(cursor):
             product_id = random.randint(1, 100)
             quantity = random.randint(1, 5)
             
-            # Get product price
-            cursor.execute("SELECT price FROM products WHERE id = ?", (product_id,))
-            price = cursor.fetchone()[0]
+            price = prices[product_id]
             
             order_items.append((order_id, product_id, quantity, price))
     
@@ -252,15 +254,16 @@ def insert_order_items(cursor):
 
 def insert_reviews(cursor, num_reviews=150):
     """Insert product reviews."""
-    reviews = []
+    product_ids = rng.integers(1, 101, num_reviews).tolist()
+    customer_ids = rng.integers(1, 51, num_reviews).tolist()
+    ratings = rng.integers(1, 6, num_reviews).tolist()
+    # About 70% of reviews leave a comment
+    comments = [
+        fake.sentence(nb_words=15) if has_comment else None
+        for has_comment in rng.random(num_reviews) > 0.3
+    ]
     
-    for _ in range(num_reviews):
-        product_id = random.randint(1, 100)
-        customer_id = random.randint(1, 50)
-        rating = random.randint(1, 5)
-        comment = fake.sentence(nb_words=15) if random.random() > 0.3 else None
-        
-        reviews.append((product_id, customer_id, rating, comment))
+    reviews = list(zip(product_ids, customer_ids, ratings, comments))
     
     cursor.executemany(
         "INSERT INTO reviews (product_id, customer_id, rating, comment) VALUES (?, ?, ?, ?)",
@@ -0,0 +1,83 @@
+"""Tests for the schema indexer."""
+import sqlite3
+
+import pytest
+
+import rag.schema_indexer as schema_indexer
+from config.settings import settings
+from database.connection import DatabaseConnection
+from database.schema_manager import SchemaManager
+
+
+class FakeCollection:
+    """In-memory stand-in for a ChromaDB collection."""
+
+    name = "schema_embeddings"
+
+    def __init__(self, space):
+        self.metadata = {"hnsw:space": space}
+        self.entries = {}
+
+    def count(self):
+        return len(self.entries)
+
+    def get(self, include=None):
+        return {"ids": list(self.entries)}
+
+    def delete(self, ids):
+        for entry_id in ids:
+            self.entries.pop(entry_id, None)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.entries.update(zip(ids, embeddings))
+
+
+@pytest.fixture
+def schema_manager(tmp_path):
+    path = tmp_path / "test.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT)")
+    return SchemaManager(DatabaseConnection(str(path), pool_size=1))
+
+
+@pytest.fixture
+def indexer(monkeypatch, schema_manager):
+    opened = []
+
+    def open_collection(create=False, reset=False):
+        # An existing collection built before the inner-product space
+        collection = FakeCollection("ip" if reset else "l2")
+        opened.append(collection)
+        return collection
+
+    async def aembed_texts(texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    monkeypatch.setattr(schema_indexer, "open_collection", open_collection)
+    monkeypatch.setattr(schema_indexer, "aembed_texts", aembed_texts)
+    monkeypatch.setattr(settings, "embedding_cache_enabled", False)
+    monkeypatch.setattr(settings, "retrieval_cache_enabled", False)
+    indexer = schema_indexer.SchemaIndexer(schema_manager)
+    indexer.opened = opened
+    return indexer
+
+
+def test_force_reindex_moves_l2_collection_to_ip(indexer):
+    indexer.collection.entries["table_stale"] = [0.0, 1.0]
+
+    indexer.index_schema(force_reindex=True)
+
+    assert indexer.collection.metadata["hnsw:space"] == "ip"
+    assert list(indexer.collection.entries) == ["table_customers"]
+    assert len(indexer.opened) == 2
+
+
+def test_force_reindex_keeps_ip_collection(indexer):
+    indexer.index_schema(force_reindex=True)
+    collection = indexer.collection
+    collection.entries["table_stale"] = [0.0, 1.0]
+
+    indexer.index_schema(force_reindex=True)
+
+    assert indexer.collection is collection
+    assert list(collection.entries) == ["table_customers"]
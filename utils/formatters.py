@@ -1,11 +1,13 @@
 """Output formatting utilities for SQL Copilot."""
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable
+from itertools import islice
+from operator import itemgetter
 from rich.console import Console
 from rich.table import Table
 from rich.syntax import Syntax
 from rich.panel import Panel
 from rich.markdown import Markdown
-import json
+import orjson
 
 
 console = Console()
@@ -16,22 +18,48 @@ def format_sql(sql: str, theme: str = "monokai") -> Syntax:
     return Syntax(sql, "sql", theme=theme, line_numbers=False)
 
 
-def format_results_table(results: List[Dict[str, Any]], title: str = "Query Results") -> Table:
-    """Format query results as a rich table."""
-    if not results:
+def format_results_table(
+    results: Iterable[Dict[str, Any]],
+    title: str = "Query Results",
+    max_rows: Optional[int] = None
+) -> Table:
+    """
+    Format query results as a rich table.
+    
+    Accepts any iterable of rows, so results can be streamed straight from
+    a cursor without first being collected into a list. With max_rows, only
+    that many rows are added to the table, so its memory stays bounded; the
+    remaining rows are consumed and counted in an "N more rows" caption.
+    """
+    rows = iter(results)
+    first = next(rows, None)
+    if first is None:
         return Table(title=title, show_header=False)
     
     # Create table
     table = Table(title=title, show_header=True, header_style="bold magenta")
     
     # Add columns
-    columns = list(results[0].keys())
+    columns = list(first.keys())
     for col in columns:
         table.add_column(col, style="cyan")
     
-    # Add rows
-    for row in results:
-        table.add_row(*[str(row.get(col, "")) for col in columns])
+    # Add rows; every row of a result set has the first row's columns
+    shown = rows if max_rows is None else islice(rows, max(max_rows - 1, 0))
+    if len(columns) == 1:
+        column = columns[0]
+        table.add_row(str(first[column]))
+        for row in shown:
+            table.add_row(str(row[column]))
+    else:
+        getter = itemgetter(*columns)
+        table.add_row(*map(str, getter(first)))
+        for row in shown:
+            table.add_row(*map(str, getter(row)))
+    
+    hidden = sum(1 for _ in rows)
+    if hidden:
+        table.caption = f"… {hidden} more rows not shown"
     
     return table
 
@@ -90,17 +118,27 @@ def export_to_csv(results: List[Dict[str, Any]], filename: str):
         print_warning("No results to export")
         return
     
+    # Positional rows in the first row's column order; itemgetter returns a
+    # bare value rather than a tuple for a single column
+    columns = list(results[0].keys())
+    if len(columns) == 1:
+        rows = ((row[columns[0]],) for row in results)
+    else:
+        getter = itemgetter(*columns)
+        rows = (getter(row) for row in results)
+    
     with open(filename, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=results[0].keys())
-        writer.writeheader()
-        writer.writerows(results)
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
     
     print_success(f"Results exported to {filename}")
 
 
 def export_to_json(results: List[Dict[str, Any]], filename: str):
     """Export results to JSON file."""
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, default=str)
+    # Values orjson cannot serialize natively (e.g. Decimal) fall back to str
+    with open(filename, 'wb') as f:
+        f.write(orjson.dumps(results, default=str, option=orjson.OPT_INDENT_2))
     
     print_success(f"Results exported to {filename}")
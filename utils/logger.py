@@ -1,9 +1,10 @@
 """Comprehensive logging setup for SQL Copilot with file and console handlers."""
 import logging
 import sys
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 import colorlog
 from pythonjsonlogger import jsonlogger
 
@@ -78,17 +79,50 @@ class SQLCopilotLogger:
         return self.logger
 
 
+_root_logger: Optional[logging.Logger] = None
+_loggers: Dict[str, logging.Logger] = {}
+_lock = threading.Lock()
+
+
+def _get_root_logger() -> logging.Logger:
+    """Configure the sql_copilot logger and its handlers once per process."""
+    global _root_logger
+    
+    if _root_logger is None:
+        with _lock:
+            if _root_logger is None:
+                from config.settings import settings
+                
+                _root_logger = SQLCopilotLogger(
+                    name="sql_copilot",
+                    log_file=settings.log_file,
+                    log_level=settings.log_level
+                ).get_logger()
+    
+    return _root_logger
+
+
 # Convenience functions for different components
 def get_logger(component_name: str) -> logging.Logger:
-    """Get a logger for a specific component."""
-    from config.settings import settings
+    """
+    Get a logger for a specific component.
+    
+    Component loggers are created once and carry no handlers of their own;
+    records propagate to the sql_copilot logger, so every component shares
+    one console handler and one open log file.
+    """
+    logger = _loggers.get(component_name)
+    if logger is not None:
+        return logger
     
-    logger_instance = SQLCopilotLogger(
-        name=f"sql_copilot.{component_name}",
-        log_file=settings.log_file,
-        log_level=settings.log_level
-    )
-    return logger_instance.get_logger()
+    _get_root_logger()
+    with _lock:
+        logger = _loggers.get(component_name)
+        if logger is None:
+            logger = logging.getLogger(f"sql_copilot.{component_name}")
+            _loggers[component_name] = logger
+    
+    return logger
 
 
 # Create main logger
@@ -96,13 +130,7 @@ def setup_logging():
     """Initialize logging system."""
     from config.settings import settings
     
-    main_logger = SQLCopilotLogger(
-        name="sql_copilot",
-        log_file=settings.log_file,
-        log_level=settings.log_level
-    )
-    
-    logger = main_logger.get_logger()
+    logger = _get_root_logger()
     logger.info("=" * 80)
     logger.info("SQL Copilot Starting")
     logger.info(f"Log Level: {settings.log_level}")